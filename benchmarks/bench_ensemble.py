@@ -0,0 +1,57 @@
+import sys
+import time
+import numpy as np
+from bench_record_lookup import make_frame
+from mmtester.data import Data
+from mmtester.dual_as_quoter import DualASQuoter
+from mmtester.ensemble import EnsembleBacktester
+from mmtester.exchange import Exchange
+from mmtester.inverse_instrument import InverseInstrument
+from mmtester.multi_mm_strategy import MultiMMStrategy
+
+
+BASE = dict(gamma=0.5, kappa=2, volatility=0.2,
+            spot_bid_price_skew=3, spot_ask_price_skew=3, spot_bid_size_skew=1, spot_ask_size_skew=1,
+            future_bid_price_skew=3, future_ask_price_skew=3, future_bid_size_skew=1, future_ask_size_skew=1,
+            spot_bid_levels=5, spot_ask_levels=5, future_bid_levels=5, future_ask_levels=5,
+            spot_target_pct=1, future_target_pct=-1, tick_size=0.05, lot_size=0.001, max_quote_size=2)
+
+
+def make_configs(size: int):
+    rng = np.random.default_rng(0)
+    return [dict(BASE, gamma=float(rng.uniform(0.1, 1.0)), kappa=float(rng.uniform(1, 4)),
+                 volatility=float(rng.uniform(0.1, 0.4)), spot_target_pct=float(rng.uniform(-1, 1)),
+                 future_target_pct=float(rng.uniform(-1, 1))) for _ in range(size)]
+
+
+def run_single(df, config) -> float:
+    spot = InverseInstrument("perp", 0.0, 0.0005)
+    future = InverseInstrument("future", -0.0001, 0.0005)
+    quoter = DualASQuoter(spot_instr=spot, future_instr=future, future_q=0, spot_q=0, tau=1, **config)
+    strategy = MultiMMStrategy("bench", quoter, 2, 1, 0, 0, 0, 0, spot, future, 1200, 2000, len(df))
+    exch = Exchange(500, 500)
+    exch.register(strategy)
+    start = time.perf_counter()
+    exch.start(Data(df, 100))
+    while exch.step():
+        pass
+    return time.perf_counter() - start
+
+
+def run_ensemble(df, configs) -> float:
+    spot = InverseInstrument("perp", 0.0, 0.0005)
+    future = InverseInstrument("future", -0.0001, 0.0005)
+    ensemble = EnsembleBacktester(spot, future, configs, 2, 1, 1200)
+    start = time.perf_counter()
+    ensemble.run(Data(df, 100))
+    return time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    df = make_frame(rows)
+    single = run_single(df, BASE)
+    print("rows: %d, single run: %.3f s" % (rows, single))
+    for size in [1, 10, 100, 1000]:
+        elapsed = run_ensemble(df, make_configs(size))
+        print("ensemble K=%5d: %8.3f s  (%6.1f single runs)" % (size, elapsed, elapsed / single))
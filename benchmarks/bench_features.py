@@ -0,0 +1,55 @@
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+from bench_generate_prices import make_book
+from mmtester.data_generator import tardis_generator
+
+
+def lstsq_slope(bid_prices, bid_volumes, ask_prices, ask_volumes, depth):
+    prices = np.concatenate((bid_prices[:depth], ask_prices[:depth]))
+    volumes = np.concatenate((np.cumsum(bid_volumes[:depth]), np.cumsum(ask_volumes[:depth])))
+    A = np.vstack([prices, np.ones_like(prices)]).T
+    return np.linalg.lstsq(A, volumes, rcond=None)[0][0]
+
+
+def by_row(bid_prices, bid_volumes, ask_prices, ask_volumes) -> float:
+    # the kernels called once per snapshot, as generate_features used to
+    start = time.perf_counter()
+    for r in range(len(bid_prices)):
+        tardis_generator.depth_features(bid_prices[r], bid_volumes[r], ask_prices[r], ask_volumes[r])
+    return len(bid_prices) / (time.perf_counter() - start)
+
+
+def by_matrix(bid_prices, bid_volumes, ask_prices, ask_volumes) -> float:
+    start = time.perf_counter()
+    tardis_generator.depth_features(bid_prices, bid_volumes, ask_prices, ask_volumes)
+    return len(bid_prices) / (time.perf_counter() - start)
+
+
+if __name__ == '__main__':
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 172800
+    bid_prices, bid_volumes, ask_prices, ask_volumes = tardis_generator.depth_matrices(make_book(rows))
+
+    features = tardis_generator.depth_features(bid_prices, bid_volumes, ask_prices, ask_volumes)
+    error = 0.0
+    for r in range(0, rows, max(rows // 1000, 1)):
+        for depth in [3, 5, 8, 12]:
+            expected = lstsq_slope(bid_prices[r], bid_volumes[r], ask_prices[r], ask_volumes[r], depth)
+            error = max(error, abs(features["feat_ob_slope_{i}".format(i=depth)][r] - expected))
+
+    sample = min(rows, 5000)
+    print("rows: %d, 4 depths x 4 features, max |slope - lstsq| %.1e" % (rows, error))
+    print("per row: %10.0f rows/s (%d rows)" % (by_row(bid_prices[:sample], bid_volumes[:sample],
+                                                       ask_prices[:sample], ask_volumes[:sample]), sample))
+    print("matrix:  %10.0f rows/s" % by_matrix(bid_prices, bid_volumes, ask_prices, ask_volumes))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "book.csv")
+        make_book(rows).to_csv(path)
+        start = time.perf_counter()
+        df = tardis_generator.generate_features(path, "perp")
+        elapsed = time.perf_counter() - start
+    print("generate_features: %10.0f rows/s (%d columns, csv parse and rolling windows included)"
+          % (rows / elapsed, len(df.columns)))
@@ -0,0 +1,68 @@
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+from mmtester.data_generator import tardis_generator
+
+LEVELS = 25
+
+
+def make_book(rows: int, seed: int=0, start: str="2023-01-21") -> pd.DataFrame:
+    # a book_snapshot_25 day as written by generate_snapshot: 500ms rows indexed by date
+    rng = np.random.default_rng(seed)
+    index = pd.date_range(start, periods=rows, freq="500ms", name="date")
+    mid = 1600 + np.cumsum(rng.normal(0, 0.2, rows))
+    half_spread = 0.25 * rng.integers(1, 4, rows)
+    columns = {"symbol": "ETH-PERPETUAL"}
+    for i in range(LEVELS):
+        columns["asks[{i}].price".format(i=i)] = mid + half_spread + 0.5 * i
+        columns["asks[{i}].amount".format(i=i)] = rng.integers(1, 500, rows) * 1.0
+        columns["bids[{i}].price".format(i=i)] = mid - half_spread - 0.5 * i
+        columns["bids[{i}].amount".format(i=i)] = rng.integers(1, 500, rows) * 1.0
+    return pd.DataFrame(columns, index=index)
+
+
+def generate_prices_loop(filename, name):
+    # the row-by-row implementation generate_prices replaced, kept as the reference
+    book = pd.read_csv(filename, header=0, index_col=['date'], parse_dates=['date'])
+    prices_df = pd.DataFrame(index=book.index)
+
+    for i in range(0, book.shape[0]):
+        curr_index = book.index[i]
+        row = book.iloc[i, :]
+        bid_price = row['bids[0].price']
+        ask_price = row['asks[0].price']
+        prices_df.loc[curr_index, name + "_bid"] = bid_price
+        prices_df.loc[curr_index, name + "_ask"] = ask_price
+        prices_df.loc[curr_index, name + "_mid"] = (bid_price + ask_price) * 0.5
+        prices_df.loc[curr_index, name + "_featdummy"] = (bid_price + ask_price) * 0.5
+    return prices_df
+
+
+def throughput(generate, path: str, rows: int) -> float:
+    start = time.perf_counter()
+    result = generate(path, "perp")
+    elapsed = time.perf_counter() - start
+    return result, rows / elapsed
+
+
+if __name__ == '__main__':
+    # a Deribit day of 500ms snapshots by default; the loop only runs on a prefix
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 172800
+    loop_rows = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "book.csv")
+        small = os.path.join(tmp, "small.csv")
+        book = make_book(rows)
+        book.to_csv(path)
+        book.iloc[:loop_rows].to_csv(small)
+
+        expected, loop_rate = throughput(generate_prices_loop, small, loop_rows)
+        result, _ = throughput(tardis_generator.generate_prices, small, loop_rows)
+        assert(expected.equals(result))
+        _, rate = throughput(tardis_generator.generate_prices, path, rows)
+
+    print("row loop:   %10.0f rows/s (%d rows)" % (loop_rate, loop_rows))
+    print("vectorized: %10.0f rows/s (%d rows, csv parse included)" % (rate, rows))
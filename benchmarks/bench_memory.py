@@ -0,0 +1,81 @@
+import sys
+import time
+import tracemalloc
+from collections import Counter
+from bench_record_lookup import make_frame
+from bench_ensemble import BASE
+from mmtester import order, record
+from mmtester.data import Data
+from mmtester.dual_as_quoter import DualASQuoter
+from mmtester.exchange import Exchange
+from mmtester.inverse_instrument import InverseInstrument
+from mmtester.multi_mm_strategy import MultiMMStrategy
+
+
+def count_instances(counts: Counter):
+    # counts newly allocated objects per concrete class; orders handed out again by the pool are not counted
+    for cls in [order.Order, record.Record, record.ArrayRecord, record.RecordBlock]:
+        init = cls.__init__
+
+        def counted(self, *args, _init=init, _cls=cls, **kwargs):
+            if type(self) is _cls:
+                counts[_cls.__name__] += 1
+            _init(self, *args, **kwargs)
+        cls.__init__ = counted
+
+    acquire = order.OrderPool.acquire
+
+    def counted_acquire(self, *args, **kwargs):
+        if self.free:
+            counts["Order"] -= 1
+        return acquire(self, *args, **kwargs)
+    order.OrderPool.acquire = counted_acquire
+
+
+def run(df, recycle_orders: bool, counts: Counter):
+    spot = InverseInstrument("perp", 0.0, 0.0005)
+    future = InverseInstrument("future", -0.0001, 0.0005)
+    quoter = DualASQuoter(spot_instr=spot, future_instr=future, future_q=0, spot_q=0, tau=1, **BASE)
+    strategy = MultiMMStrategy("bench", quoter, 2, 1, 0, 0, 0, 0, spot, future, 1200, 2000, len(df))
+    exch = Exchange(500, 500, recycle_orders=recycle_orders)
+    exch.register(strategy)
+    exch.start(Data(df, 100))
+
+    counts.clear()
+    tracemalloc.start()
+    start = time.perf_counter()
+    steps = 0
+    while exch.step():
+        steps += 1
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return steps, elapsed, peak, dict(counts)
+
+
+def object_bytes(cls, size: int=10000) -> float:
+    args = {order.Order: (0, "bench", None, None, 1.0, 1.0),
+            record.ArrayRecord: (0, 0, Data(make_frame(1), 100), 0)}[cls]
+    tracemalloc.start()
+    objects = [cls(*args) for _ in range(size)]
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del objects
+    return current / size
+
+
+if __name__ == '__main__':
+    # one day of 100ms ticks by default
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 864000
+    df = make_frame(rows)
+    print("rows: %d" % rows)
+    print("Order:       %6.0f bytes/object" % object_bytes(order.Order))
+    print("ArrayRecord: %6.0f bytes/object" % object_bytes(record.ArrayRecord))
+
+    counts = Counter()
+    count_instances(counts)
+    for recycle_orders in [False, True]:
+        steps, elapsed, peak, created = run(df, recycle_orders, counts)
+        per_tick = ", ".join("%s %.3f" % (name, n / steps) for name, n in sorted(created.items()))
+        print("recycle_orders=%-5s %7.2f s  peak %8.1f MiB  objects/tick: %s"
+              % (recycle_orders, elapsed, peak / 2**20, per_tick))
@@ -0,0 +1,40 @@
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+from datetime import date, timedelta
+from bench_generate_prices import make_book
+from mmtester import tick_store
+from mmtester.data_generator import tardis_generator
+
+
+def write_days(path: str, days: int, rows: int) -> None:
+    # perp and future snapshot files laid out the way day_files expects them
+    os.makedirs(os.path.join(path, "perp"))
+    for k in range(days):
+        day = date(2023, 1, 21) + timedelta(days=k)
+        perp = make_book(rows, seed=k, start=str(day))
+        future = make_book(rows, seed=1000 + k, start=str(pd.Timestamp(day) + pd.Timedelta("250ms")))
+        perp.to_csv(os.path.join(path, "perp", "deribit_book_snapshot_25_%s_ETH-PERPETUAL.csv" % day))
+        future.to_csv(os.path.join(path, "deribit_book_snapshot_25_%s_ETH-31MAR23.csv" % day))
+
+
+if __name__ == '__main__':
+    days = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    rows = int(sys.argv[2]) if len(sys.argv) > 2 else 172800
+    cores = os.cpu_count()
+    with tempfile.TemporaryDirectory() as tmp:
+        write_days(tmp, days, rows)
+        end = date(2023, 1, 21) + timedelta(days=days - 1)
+        print("days: %d, rows/day: %d, cores: %d" % (days, rows, cores))
+        results = []
+        for workers in sorted({1, cores}):
+            output = os.path.join(tmp, "data_%d" % workers)
+            start = time.perf_counter()
+            tardis_generator.generate_dataset(tmp, date(2023, 1, 21), end, output, features=True, workers=workers)
+            elapsed = time.perf_counter() - start
+            results.append(tick_store.load(output + ".bin")[2])
+            print("workers=%-3d %8.2f s  %6.2f days/s" % (workers, elapsed, days / elapsed))
+        assert(all(np.array_equal(values, results[0]) for values in results))
@@ -0,0 +1,63 @@
+import sys
+import time
+import numpy as np
+import pandas as pd
+from mmtester.data import Data
+from mmtester.inverse_instrument import InverseInstrument
+
+
+def make_frame(rows: int) -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    index = pd.date_range("2023-01-21", periods=rows, freq="100ms")
+    df = pd.DataFrame(index=index)
+    for name in ["perp", "future"]:
+        mid = 1600 + np.cumsum(rng.normal(0, 0.2, rows))
+        df[name + "_bid"] = mid - 0.05
+        df[name + "_ask"] = mid + 0.05
+        df[name + "_mid"] = mid
+    for i in range(16):
+        df["feat_{i}".format(i=i)] = rng.normal(0, 1, rows)
+    return df
+
+
+def run(dataObject: Data, instruments, lookup) -> float:
+    rows = dataObject.get_rows()
+    start = time.perf_counter()
+    for counter in range(rows):
+        record = dataObject.get_record(counter, counter)
+        for instrument in instruments:
+            lookup(record, instrument)
+    return (time.perf_counter() - start) / rows * 1e9
+
+
+def no_lookup(record, instrument):
+    pass
+
+
+def by_name(record, instrument):
+    record.get_instrument_data(instrument, "bid")
+    record.get_instrument_data(instrument, "ask")
+    record.get_instrument_data(instrument, "mid")
+
+
+def by_handle(record, instrument):
+    record.get_bid(instrument)
+    record.get_ask(instrument)
+    record.get_mid(instrument)
+
+
+if __name__ == '__main__':
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    df = make_frame(rows)
+    instruments = [InverseInstrument("perp", 0.0, 0.0005), InverseInstrument("future", -0.0001, 0.0005)]
+
+    series_data = Data(df, 100, columnar=False)
+    columnar_data = Data(df, 100)
+    for instrument in instruments:
+        columnar_data.bind_instrument(instrument)
+
+    print("rows: %d, lookups per tick: %d" % (rows, 3 * len(instruments)))
+    print("columnar record only:       %10.0f ns/tick" % run(columnar_data, instruments, no_lookup))
+    print("pandas row + name lookup:   %10.0f ns/tick" % run(series_data, instruments, by_name))
+    print("columnar + name lookup:     %10.0f ns/tick" % run(columnar_data, instruments, by_name))
+    print("columnar + resolved handle: %10.0f ns/tick" % run(columnar_data, instruments, by_handle))
@@ -0,0 +1,41 @@
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+from mmtester.data_generator import tardis_generator
+
+LEVELS = 25
+
+
+def make_raw(rows: int, seed: int=0) -> pd.DataFrame:
+    # a raw tardis book_snapshot_25 file: irregular microsecond timestamps, several updates per 500ms bucket
+    rng = np.random.default_rng(seed)
+    timestamps = 1674259200000000 + np.cumsum(rng.integers(5000, 300000, rows))
+    mid = 1600 + np.cumsum(rng.normal(0, 0.1, rows))
+    columns = {"exchange": "deribit", "symbol": "ETH-PERPETUAL",
+               "timestamp": timestamps, "local_timestamp": timestamps + 1000}
+    for i in range(LEVELS):
+        columns["asks[{i}].price".format(i=i)] = np.round(mid + 0.25 + 0.05 * i, 2)
+        columns["asks[{i}].amount".format(i=i)] = rng.integers(1, 500, rows) * 1.0
+        columns["bids[{i}].price".format(i=i)] = np.round(mid - 0.25 - 0.05 * i, 2)
+        columns["bids[{i}].amount".format(i=i)] = rng.integers(1, 500, rows) * 1.0
+    return pd.DataFrame(columns)
+
+
+if __name__ == '__main__':
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 500000
+    chunksize = int(sys.argv[2]) if len(sys.argv) > 2 else 100000
+    with tempfile.TemporaryDirectory() as tmp:
+        raw = os.path.join(tmp, "raw.csv")
+        make_raw(rows).to_csv(raw, index=False)
+        print("raw rows: %d, chunksize: %d" % (rows, chunksize))
+        for output in ["snapshot.csv", "snapshot.bin", "snapshot.parquet"]:
+            if output.endswith(".parquet") and tardis_generator.pyarrow is None:
+                print("%-17s skipped, pyarrow not installed" % output)
+                continue
+            start = time.perf_counter()
+            tardis_generator.generate_snapshot(raw, os.path.join(tmp, output), chunksize=chunksize)
+            elapsed = time.perf_counter() - start
+            print("%-17s %10.0f raw rows/s" % (output, rows / elapsed))
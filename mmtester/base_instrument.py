@@ -7,6 +7,9 @@ class BaseInstrument:
         self.symbol = symbol
         self.maker_fee = maker_fee
         self.taker_fee = taker_fee
+        self.bid_col: int = None
+        self.ask_col: int = None
+        self.mid_col: int = None
     
         
     @property
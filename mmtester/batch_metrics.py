@@ -0,0 +1,100 @@
+import numpy as np
+import pandas as pd
+from typing import List, Tuple
+from mmtester import data, ensemble, stat
+from mmtester.sweep import SUMMARY_COLUMNS
+
+
+def bucket_last(timestamps: np.ndarray, values: np.ndarray, resample: str) -> Tuple[np.ndarray, np.ndarray]:
+    # rows of values at the last tick of every bucket between the first and the last, NaN for empty buckets;
+    # buckets are counted from midnight of the first day like DataFrame.resample
+    width = pd.Timedelta(resample).value
+    origin = data.day_origin(timestamps[0])
+    buckets = (timestamps - origin) // width
+    last = np.flatnonzero(np.r_[buckets[1:] != buckets[:-1], True])
+    slots = buckets[last] - buckets[0]
+    rs = np.full((slots[-1] + 1,) + values.shape[1:], np.nan)
+    rs[slots] = values[last]
+    return origin + (buckets[0] + np.arange(len(rs))) * width, rs
+
+
+def bucket_pnl(times: np.ndarray, rs_equity: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    # runs share the timeline, so a bucket is empty for all of them or for none
+    pnl = np.diff(rs_equity, axis=0)
+    valid = ~np.isnan(pnl).any(axis=1)
+    return times[1:][valid], pnl[valid]
+
+
+def annualisation(times: np.ndarray, trading_days: int) -> float:
+    c = (24 * 3600) / ((times[1] - times[0]) / 1e9)
+    return np.sqrt(c * trading_days)
+
+
+def sharpe(pnl: np.ndarray) -> np.ndarray:
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return pnl.mean(axis=0) / pnl.std(axis=0, ddof=1)
+
+
+def sortino(pnl: np.ndarray) -> np.ndarray:
+    negative = pnl < 0
+    count = negative.sum(axis=0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean = np.where(negative, pnl, 0).sum(axis=0) / count
+        var = np.where(negative, (pnl - mean) ** 2, 0).sum(axis=0) / (count - 1)
+        std = np.where(count > 1, np.sqrt(var), np.nan)
+        return pnl.mean(axis=0) / std
+
+
+def maxdrawdown(rs_equity: np.ndarray) -> np.ndarray:
+    peak = np.fmax.accumulate(rs_equity, axis=0)
+    return -np.nanmin(rs_equity - peak, axis=0)
+
+
+def trade_frequency(timestamps: np.ndarray, counters: np.ndarray, interval: str) -> np.ndarray:
+    # mean over ticks of the counter increase within the trailing window, as diff().rolling(interval).sum().mean()
+    window = pd.Timedelta(interval).value
+    start = np.searchsorted(timestamps, timestamps - window, side="right")
+    base = np.maximum(start[1:] - 1, 0)
+    return (counters[1:] - counters[base]).mean(axis=0)
+
+
+def summary(timestamps: np.ndarray, equity: np.ndarray, balance: np.ndarray, fee: np.ndarray,
+            trade_num: np.ndarray, trade_qty: np.ndarray, resample: str='5min', interval: str='15Min',
+            trading_days: int=365) -> pd.DataFrame:
+    # one Stat.summary row per column of the (ticks, runs) matrices
+    times, rs_equity = bucket_last(timestamps, equity, resample)
+    pnl_times, pnl = bucket_pnl(times, rs_equity)
+    scale = annualisation(pnl_times, trading_days)
+    capital = balance[0]
+    days = int(timestamps[-1] - timestamps[0]) / 1e9 / (24 * 3600)
+
+    return pd.DataFrame({
+        'days': np.full(equity.shape[1], days),
+        'balance': balance[-1],
+        'sharpe': sharpe(pnl) * scale,
+        'sortino': sortino(pnl) * scale,
+        'return': (equity[-1] - equity[0]) / capital * 100,
+        'fee': np.sum(np.diff(fee, axis=0), axis=0),
+        'drawdown': maxdrawdown(rs_equity) / capital * 100,
+        'num_trades': trade_frequency(timestamps, trade_num, interval),
+        'q_trades': trade_frequency(timestamps, trade_qty, interval),
+    }, columns=SUMMARY_COLUMNS)
+
+
+def from_stats(stats: List[stat.Stat], **kwargs) -> pd.DataFrame:
+    first = stats[0]
+    n = first.curr_record
+    for s in stats:
+        assert(s.curr_record == n and np.array_equal(s.timestamp[:n], first.timestamp[:n]))
+
+    def column(name: str) -> np.ndarray:
+        return np.column_stack([getattr(s, name)[:n] for s in stats])
+
+    equity = np.column_stack([s.equity().to_numpy() for s in stats])
+    return summary(first.timestamp[:n], equity, column("balance"), column("fee"),
+                   column("trade_num"), column("trade_qty"), **kwargs)
+
+
+def from_ensemble(timestamps: np.ndarray, result: ensemble.EnsembleLegResult, **kwargs) -> pd.DataFrame:
+    return summary(timestamps, result.equity(), result.balance, result.fee,
+                   result.trade_num, result.trade_qty, **kwargs)
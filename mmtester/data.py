@@ -1,57 +1,260 @@
-from typing import List
+from typing import Dict, Iterable, Iterator, List
+import numpy as np
 import pandas as pd
-from mmtester import record
+from mmtester import base_instrument, record, tick_store
+
+
+def to_nanos(index: pd.DatetimeIndex) -> np.ndarray:
+    return np.asarray(index, dtype="datetime64[ns]").view(np.int64)
+
+
+def to_datetime(nanos: np.ndarray) -> pd.DatetimeIndex:
+    return pd.DatetimeIndex(np.asarray(nanos, dtype=np.int64).view("datetime64[ns]"))
+
+
+NANOS_PER_DAY = 24 * 3600 * 1000000000
+
+
+def day_origin(timestamp: int) -> int:
+    # midnight of the timestamp's day, resample buckets are counted from it like DataFrame.resample
+    return timestamp - timestamp % NANOS_PER_DAY
+
+
+def infer_frequency(index: pd.DatetimeIndex) -> int:
+    # sample spacing in milliseconds, the median so a few gaps in the feed do not skew it
+    nanos = to_nanos(index)
+    assert(len(nanos) > 1)
+    return int(round(np.median(np.diff(nanos)) / 1000000))
 
 
 class Data:
-    def __init__(self, df: pd.DataFrame, frequency_milliseconds: int):
+    def __init__(self, df: pd.DataFrame, frequency_milliseconds: int, columnar: bool=True):
         self.df = df
         self.frequency = frequency_milliseconds
-        cols = self.get_columns()
-        
-        self.features: List[str] = []
-        self.instr_names: List[str] = []
-        
-        for col in cols:
-            if "feat_" in col:
-                self.features.append(col)
-            elif '_mid' in col:
-                names = col.split('_')
-                self.instr_names.append(names[0])
-        
+        self.columnar: bool = columnar
+        self.describe(list(df.columns))
+
+        if self.columnar:
+            # one contiguous float64 block, column-major so every column is a contiguous array
+            self.attach(df.index, np.asfortranarray(df.to_numpy(dtype=np.float64)))
+        else:
+            self.index: pd.DatetimeIndex = df.index
+            self.timestamps: np.ndarray = to_nanos(df.index)
+
+
+    @classmethod
+    def from_arrays(cls, index: pd.DatetimeIndex, values: np.ndarray, columns: List[str],
+                    frequency_milliseconds: int) -> 'Data':
+        assert(values.shape == (len(index), len(columns)))
+        dataObject = cls.__new__(cls)
+        dataObject.df = None
+        dataObject.frequency = frequency_milliseconds
+        dataObject.columnar = True
+        dataObject.describe(list(columns))
+        dataObject.attach(index, values)
+        return dataObject
+
+
+    @classmethod
+    def from_tick_store(cls, path: str, frequency_milliseconds: int) -> 'Data':
+        header, timestamps, values = tick_store.load(path)
+        return cls.from_arrays(to_datetime(timestamps), values, header["columns"], frequency_milliseconds)
+
+
+    def to_tick_store(self, path: str) -> None:
+        tick_store.write(path, self.get_raw())
+
+
+    def describe(self, cols: List[str]) -> None:
+        self.columns: List[str] = cols
+        self.instr_names, self.features = tick_store.describe_columns(cols)
+
         for name in self.instr_names:
             assert(name + "_bid" in cols)
             assert(name + "_ask" in cols)
-    
-    
+
+
+    def attach(self, index: pd.DatetimeIndex, values: np.ndarray) -> None:
+        self.index = index
+        self.timestamps: np.ndarray = to_nanos(index)
+        self.values: np.ndarray = values
+        self.column_index: Dict[str, int] = {col: i for i, col in enumerate(self.columns)}
+        self.feature_cols: np.ndarray = np.array([self.column_index[f] for f in self.features], dtype=np.int64)
+
+
+    def slice(self, start: int, stop: int) -> 'Data':
+        if self.columnar:
+            return Data.from_arrays(self.index[start:stop], self.values[start:stop, :],
+                                    self.columns, self.frequency)
+        return Data(self.df.iloc[start:stop, :], self.frequency, columnar=False)
+
+
     def get_feature_names(self)-> List[str]:
         return self.features
-    
-    
+
+
     def get_instrument_names(self)-> List[str]:
         return self.instr_names
-    
-        
+
+
     def get_columns(self)-> List[str]:
-        return list(self.df.columns)
-    
-    
+        return list(self.columns)
+
+
+    def bind_instrument(self, instrument: base_instrument.BaseInstrument) -> None:
+        cols = self.get_columns()
+        instrument.bid_col = cols.index(instrument.name + "_bid")
+        instrument.ask_col = cols.index(instrument.name + "_ask")
+        instrument.mid_col = cols.index(instrument.name + "_mid")
+
+
     def get_rows(self) -> int:
-        return self.df.shape[0]
-    
-    
+        return len(self.index)
+
+
+    def has_row(self, counter: int) -> bool:
+        return counter < len(self.index)
+
+
+    def get_column(self, name: str) -> np.ndarray:
+        if self.columnar:
+            return self.values[:, self.column_index[name]]
+        return self.df[name].to_numpy(dtype=np.float64)
+
+
     def get_record(self, time_counter, fetch_counter: int) -> record.Record:
-        return record.Record(fetch_counter, self.get_index(time_counter), self.df.iloc[fetch_counter, :])
-    
-    
+        if self.columnar:
+            return record.ArrayRecord(fetch_counter, self.timestamps.item(time_counter), self, fetch_counter)
+        return record.Record(fetch_counter, self.timestamps.item(time_counter), self.df.iloc[fetch_counter, :])
+
+
+    def get_block(self, time_counter: int, fetch_counter: int, length: int) -> record.RecordBlock:
+        assert(self.columnar)
+        return record.RecordBlock(fetch_counter, self.timestamps[time_counter:time_counter + length], self, fetch_counter)
+
+
+    def get_column_range(self, col: int, start: int, stop: int) -> np.ndarray:
+        return self.values[start:stop, col]
+
+
+    def get_last_row(self) -> int:
+        return len(self.index) - 1
+
+
+    def search_timestamp(self, timestamp: int) -> int:
+        return int(np.searchsorted(self.timestamps, timestamp, side="left"))
+
+
     def get_index(self, counter: int) -> pd.DatetimeIndex:
-        return self.df.index[counter]
-    
-    
+        return self.index[counter]
+
+
+    def get_timestamp(self, counter: int) -> int:
+        return self.timestamps.item(counter)
+
+
     def get_feature_history(self, counter: int, history: int) -> pd.DataFrame:
+        if self.columnar:
+            rows = slice(counter-history+1, counter+1)
+            return pd.DataFrame(self.values[rows, self.feature_cols], index=self.index[rows], columns=self.features)
         idx = self.df.index[counter-history+1:counter+1]
         return self.df.loc[idx, self.features]
-    
-    
+
+
     def get_raw(self) -> pd.DataFrame:
-        return self.df
\ No newline at end of file
+        if self.df is None:
+            self.df = pd.DataFrame(np.asarray(self.values), index=self.index, columns=self.columns)
+        return self.df
+
+
+class DataStream:
+    def __init__(self, chunks: Iterable, frequency_milliseconds: int=None):
+        self.chunks: Iterator = iter(chunks)
+        self.frequency = frequency_milliseconds
+        self.offset: int = 0
+        self.retain: int = 1
+        self.window: Data = self.next_chunk()
+        assert(self.window is not None)
+        self.frequency = self.window.frequency
+
+
+    def next_chunk(self) -> Data:
+        for chunk in self.chunks:
+            if isinstance(chunk, pd.DataFrame):
+                if self.frequency is None:
+                    self.frequency = infer_frequency(chunk.index)
+                chunk = Data(chunk, self.frequency)
+            assert(chunk.columnar)
+            if chunk.get_rows() > 0:
+                return chunk
+        return None
+
+
+    def advance(self) -> bool:
+        chunk = self.next_chunk()
+        if chunk is None:
+            return False
+
+        assert(chunk.columns == self.window.columns)
+        # carry the tail of the old window over so latency-delayed lookups still resolve
+        start = max(self.window.get_rows() - self.retain, 0)
+        index = self.window.index[start:].append(chunk.index)
+        values = np.asfortranarray(np.concatenate([self.window.values[start:, :], chunk.values]))
+        self.window = Data.from_arrays(index, values, chunk.columns, self.frequency)
+        self.offset += start
+        return True
+
+
+    def get_feature_names(self)-> List[str]:
+        return self.window.get_feature_names()
+
+
+    def get_instrument_names(self)-> List[str]:
+        return self.window.get_instrument_names()
+
+
+    def get_columns(self)-> List[str]:
+        return self.window.get_columns()
+
+
+    def bind_instrument(self, instrument: base_instrument.BaseInstrument) -> None:
+        self.window.bind_instrument(instrument)
+
+
+    def has_row(self, counter: int) -> bool:
+        while counter - self.offset >= self.window.get_rows():
+            if not self.advance():
+                return False
+        return True
+
+
+    def get_record(self, time_counter, fetch_counter: int) -> record.Record:
+        return record.ArrayRecord(fetch_counter, self.window.timestamps.item(time_counter - self.offset),
+                                  self.window, fetch_counter - self.offset)
+
+
+    def get_block(self, time_counter: int, fetch_counter: int, length: int) -> record.RecordBlock:
+        start = time_counter - self.offset
+        return record.RecordBlock(fetch_counter, self.window.timestamps[start:start + length],
+                                  self.window, fetch_counter - self.offset)
+
+
+    def get_column_range(self, col: int, start: int, stop: int) -> np.ndarray:
+        return self.window.values[start - self.offset:stop - self.offset, col]
+
+
+    def get_last_row(self) -> int:
+        # only rows already loaded are addressable; later chunks are pulled in by has_row
+        return self.offset + self.window.get_rows() - 1
+
+
+    def search_timestamp(self, timestamp: int) -> int:
+        return self.offset + self.window.search_timestamp(timestamp)
+
+
+    def get_index(self, counter: int) -> pd.DatetimeIndex:
+        return self.window.index[counter - self.offset]
+
+
+    def get_timestamp(self, counter: int) -> int:
+        return self.window.timestamps.item(counter - self.offset)
@@ -1,86 +1,220 @@
 import numpy as np
 import os
 import pandas as pd
-from tqdm import tqdm
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from datetime import date, timedelta
+from mmtester import tick_store
 
-def generate_snapshot(input_path, output_path):
-    chunksize = 1000 * 1000
-
-    if os.path.exists(output_path):
-        os.remove(output_path)
-
-    for chunk in pd.read_csv(input_path, 
-                              header=0,
-                              chunksize=chunksize):
-        chunk['date'] = pd.to_datetime(chunk['timestamp'], unit='us')
-        chunk['td'] = pd.to_timedelta( chunk['timestamp'],'us')
-        chunk = chunk.set_index('td')
-        chunk = chunk.resample('500ms').last()
-        chunk = chunk.reset_index(drop=True)
-        chunk = chunk.set_index('date')
-        chunk = chunk.drop(['exchange', 'timestamp', 'local_timestamp'], axis=1)
-        chunk.dropna().to_csv(output_path, mode='a', header=not os.path.exists(output_path))
+try:
+    import pyarrow
+    import pyarrow.csv
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+# columns of a raw tardis file that never reach a snapshot
+RAW_DROPPED = ['exchange', 'local_timestamp']
+# rolling window lengths in rows; the longest is the warm-up a day needs from the day before
+HISTORIES = [300, 600, 1200]
+
+
+def read_chunks(input_path, chunksize):
+    # raw tardis rows with only the needed columns and an explicit dtype per column, so nothing is inferred
+    columns = [col for col in pd.read_csv(input_path, nrows=0).columns if col not in RAW_DROPPED]
+    dtypes = {col: ("int64" if col == "timestamp" else "str" if col == "symbol" else "float64") for col in columns}
+    if pyarrow is None:
+        yield from pd.read_csv(input_path, header=0, usecols=columns, dtype=dtypes, chunksize=chunksize)
+        return
+
+    types = {col: (pyarrow.int64() if dtype == "int64" else pyarrow.string() if dtype == "str" else pyarrow.float64())
+             for col, dtype in dtypes.items()}
+    reader = pyarrow.csv.open_csv(input_path,
+                                  read_options=pyarrow.csv.ReadOptions(block_size=64 << 20),
+                                  convert_options=pyarrow.csv.ConvertOptions(include_columns=columns,
+                                                                             column_types=types))
+    for batch in reader:
+        yield batch.to_pandas()
+
+
+def snapshot(rows, buckets):
+    # last value per bucket, indexed by the time of the bucket's last row
+    df = rows.groupby(buckets).last()
+    df.index = pd.DatetimeIndex(pd.to_datetime(df['timestamp'].to_numpy(), unit='us'), name='date')
+    return df.drop(['timestamp'], axis=1).dropna()
+
+
+def snapshot_chunks(chunks, frequency='500ms'):
+    # rows of the bucket still open at the end of a chunk are carried into the next one, so every bucket
+    # is emitted exactly once with its true last value; buckets are aligned to midnight
+    width = pd.Timedelta(frequency).value // 1000
+    carry = None
+    for chunk in chunks:
+        if carry is not None:
+            chunk = pd.concat([carry, chunk], ignore_index=True)
+        buckets = chunk['timestamp'].to_numpy() // width
+        open_bucket = buckets == buckets[-1]
+        carry = chunk[open_bucket]
+        closed = ~open_bucket
+        if closed.any():
+            yield snapshot(chunk[closed], buckets[closed])
+    if carry is not None:
+        yield snapshot(carry, carry['timestamp'].to_numpy() // width)
+
+
+class CsvWriter:
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "w")
+        self.header = True
+
+
+    def append(self, df):
+        df.to_csv(self.file, header=self.header)
+        self.header = False
+
+
+    def close(self):
+        self.file.close()
+
+
+    def abort(self):
+        self.file.close()
+        os.remove(self.path)
+
+
+class ParquetWriter:
+    def __init__(self, path):
+        if pyarrow is None:
+            raise RuntimeError("pyarrow is required for parquet output")
+        self.path = path
+        self.writer = None
+
+
+    def append(self, df):
+        table = pyarrow.Table.from_pandas(df, preserve_index=True)
+        if self.writer is None:
+            self.writer = pyarrow.parquet.ParquetWriter(self.path, table.schema)
+        self.writer.write_table(table)
+
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+    def abort(self):
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class TickStoreWriter(tick_store.Writer):
+    def append(self, df):
+        # the tick store only holds float64 columns, so the symbol is left out
+        super().append(df.select_dtypes(include=[np.number]))
+
+
+def open_writer(output_path):
+    if output_path.endswith(".parquet"):
+        return ParquetWriter(output_path)
+    if output_path.endswith(".bin"):
+        return TickStoreWriter(output_path)
+    return CsvWriter(output_path)
+
+
+def generate_snapshot(input_path, output_path, chunksize=1000 * 1000, frequency='500ms'):
+    # streams a raw book_snapshot_25 file of any size in chunksize rows to csv, parquet or a tick store,
+    # chosen by the output extension
+    # the output is only finalized once every chunk went through; on an error nothing is left behind
+    writer = open_writer(output_path)
+    try:
+        for df in snapshot_chunks(read_chunks(input_path, chunksize), frequency):
+            writer.append(df)
+    except BaseException:
+        writer.abort()
+        raise
+    writer.close()
+
+
+def read_book(filename, columns=None):
+    # a snapshot file written by generate_snapshot, indexed by date
+    if filename.endswith(".parquet"):
+        book = pd.read_parquet(filename, columns=columns)
+    elif filename.endswith(".bin"):
+        header, timestamps, values = tick_store.load(filename)
+        book = pd.DataFrame(np.asarray(values), columns=header["columns"],
+                            index=pd.DatetimeIndex(pd.to_datetime(np.asarray(timestamps)), name='date'))
+        if columns is not None:
+            book = book[columns]
+    else:
+        usecols = None if columns is None else ['date'] + columns
+        book = pd.read_csv(filename, header=0, index_col=['date'], parse_dates=['date'], usecols=usecols)
+    return book
         
 
 def bid_ask_imbalance(bid_volumes, ask_volumes, level):
-    total_bid_volume = sum(bid_volumes[:level])
-    total_ask_volume = sum(ask_volumes[:level])
+    # rows are snapshots and columns depth levels; a single 1-D snapshot works as well
+    total_bid_volume = np.cumsum(bid_volumes[..., :level], axis=-1)[..., -1]
+    total_ask_volume = np.cumsum(ask_volumes[..., :level], axis=-1)[..., -1]
     
     imbalance = (total_bid_volume - total_ask_volume) / (total_bid_volume + total_ask_volume)
     return ("feat_bid_ask_imbalance_{i}".format(i=level), imbalance)
 
 
 def weighted_imbalance(bid_prices, bid_volumes, ask_prices, ask_volumes, depth):
-    best_bid = bid_prices[0]
-    best_ask = ask_prices[0]
+    best_bid = bid_prices[..., :1]
+    best_ask = ask_prices[..., :1]
 
-    weighted_bid_volume = 0
-    weighted_ask_volume = 0
-    
-    for i in range(0, depth):
-        weighted_bid_volume += (best_ask - bid_prices[i]) / (best_ask - best_bid) * bid_volumes[i]
-        weighted_ask_volume += (ask_prices[i] - best_bid) / (best_ask - best_bid) * ask_volumes[i] 
+    weighted_bid_volume = np.cumsum((best_ask - bid_prices[..., :depth]) / (best_ask - best_bid) * bid_volumes[..., :depth], axis=-1)[..., -1]
+    weighted_ask_volume = np.cumsum((ask_prices[..., :depth] - best_bid) / (best_ask - best_bid) * ask_volumes[..., :depth], axis=-1)[..., -1]
     
     imbalance = (weighted_bid_volume - weighted_ask_volume) / (weighted_bid_volume + weighted_ask_volume)
     return ("feat_weighted_imbalance_{i}".format(i=depth), imbalance)
 
 
 def orderbook_slope(bid_prices, bid_volumes, ask_prices, ask_volumes, depth):
-    bid_prices = np.array(bid_prices, dtype=np.float64)
-    bid_volumes = np.array(bid_volumes, dtype=np.float64)
-    ask_prices = np.array(ask_prices, dtype=np.float64)
-    ask_volumes = np.array(ask_volumes, dtype=np.float64)
+    # least-squares slope of cumulative volume against price, in closed form for every snapshot at once
+    prices = np.concatenate((bid_prices[..., :depth], ask_prices[..., :depth]), axis=-1)
+    volumes = np.concatenate((np.cumsum(bid_volumes[..., :depth], axis=-1),
+                              np.cumsum(ask_volumes[..., :depth], axis=-1)), axis=-1)
 
-    bid_volumes = np.cumsum(bid_volumes[:depth])
-    bid_prices = bid_prices[:depth]
-
-    ask_volumes = np.cumsum(ask_volumes[:depth])
-    ask_prices = ask_prices[:depth]
-
-    prices = np.concatenate((bid_prices, ask_prices))
-    volumes = np.concatenate((bid_volumes, ask_volumes))
-
-    A = np.vstack([prices, np.ones_like(prices)]).T
-    slope, _ = np.linalg.lstsq(A, volumes, rcond=None)[0]
+    prices = prices - prices.mean(axis=-1, keepdims=True)
+    volumes = volumes - volumes.mean(axis=-1, keepdims=True)
+    slope = np.sum(prices * volumes, axis=-1) / np.sum(prices * prices, axis=-1)
     return ("feat_ob_slope_{i}".format(i=depth), slope)        
 
 
 def depth_weighted_spread(bid_prices, bid_volumes, ask_prices, ask_volumes, depth):
-    weighted_spreads_sum = 0
-    total_volume = 0
+    spreads = ask_prices[..., :depth] - bid_prices[..., :depth]
+    avg_volumes = (bid_volumes[..., :depth] + ask_volumes[..., :depth]) / 2.0
     
-    for i in range(depth):
-        spread = ask_prices[i] - bid_prices[i]
-        avg_volume = (bid_volumes[i] + ask_volumes[i]) / 2.0
-        
-        weighted_spreads_sum += spread * avg_volume
-        total_volume += avg_volume
+    weighted_spreads_sum = np.cumsum(spreads * avg_volumes, axis=-1)[..., -1]
+    total_volume = np.cumsum(avg_volumes, axis=-1)[..., -1]
     
     depth_weighted_spread = weighted_spreads_sum / total_volume
     return ("feat_depth_spread_{i}".format(i=depth), depth_weighted_spread)
 
 
+def depth_matrices(book, depth=24):
+    # (rows, depth) price and volume matrices for each side of the book
+    def matrix(side, field):
+        cols = ['{side}[{i}].{field}'.format(side=side, i=i, field=field) for i in range(depth)]
+        return book[cols].to_numpy(dtype=np.float64)
+    return matrix('bids', 'price'), matrix('bids', 'amount'), matrix('asks', 'price'), matrix('asks', 'amount')
+
+
+def depth_features(bid_prices, bid_volumes, ask_prices, ask_volumes, levels=(3, 5, 8, 12)):
+    features = {}
+    for level in levels:
+        for name, values in [bid_ask_imbalance(bid_volumes, ask_volumes, level),
+                             weighted_imbalance(bid_prices, bid_volumes, ask_prices, ask_volumes, level),
+                             orderbook_slope(bid_prices, bid_volumes, ask_prices, ask_volumes, level),
+                             depth_weighted_spread(bid_prices, bid_volumes, ask_prices, ask_volumes, level)]:
+            features[name] = values
+    return features
+
+
 def ewma(data, window):
     alpha = 2 /(window + 1.0)
     alpha_rev = 1-alpha
@@ -97,78 +231,85 @@ def ewma(data, window):
     return out
 
 
+def rolling_features(values, history):
+    # mean, ewma and std over the history + 1 rows ending at each row, NaN until the first full window;
+    # running sums are taken around the overall mean so the variance does not cancel at price scale
+    n = history + 1
+    mean = np.full(len(values), np.nan)
+    ema = np.full(len(values), np.nan)
+    vol = np.full(len(values), np.nan)
+    if len(values) < n:
+        return mean, ema, vol
+
+    centre = values.mean()
+    sums = np.cumsum(np.r_[0.0, values - centre])
+    squares = np.cumsum(np.r_[0.0, (values - centre) ** 2])
+    window_mean = (sums[n:] - sums[:-n]) / n
+    mean[history:] = window_mean + centre
+    vol[history:] = np.sqrt(np.maximum((squares[n:] - squares[:-n]) / n - window_mean ** 2, 0))
+
+    # ewma(window, history)[-1] is decay * x[i - history] + alpha * S[i] with the weighted window sum
+    # S[i] = (1 - alpha) * S[i - 1] + x[i] - decay * x[i - n], which a recursive EWMA carries in O(1) per row
+    alpha = 2 / (history + 1.0)
+    decay = (1 - alpha) ** n
+    inputs = np.array(values, dtype=np.float64)
+    inputs[n:] -= decay * values[:-n]
+    inputs[0] *= alpha
+    state = pd.Series(inputs).ewm(alpha=alpha, adjust=False).mean().to_numpy()
+    ema[history:] = decay * values[:len(values) - history] + state[history:]
+    return mean, ema, vol
+
+
+def price_columns(book, name):
+    bid_price = book['bids[0].price'].to_numpy(dtype=np.float64)
+    ask_price = book['asks[0].price'].to_numpy(dtype=np.float64)
+    if not book.index.is_unique:
+        # rows sharing a timestamp all take the values of the last of them
+        last = pd.Series(np.arange(len(book))).groupby(book.index.to_numpy()).transform('max').to_numpy()
+        bid_price = bid_price[last]
+        ask_price = ask_price[last]
+    mid_price = (bid_price + ask_price) * 0.5
+    return pd.DataFrame({name + "_bid": bid_price,
+                         name + "_ask": ask_price,
+                         name + "_mid": mid_price,
+                         name + "_featdummy": mid_price}, index=book.index)
+
+
 def generate_prices(filename, name):
-    book = pd.read_csv(filename, header=0, index_col=['date'], parse_dates=['date'])
-    prices_df = pd.DataFrame(index=book.index)
-    
-    for i in tqdm(range(0, book.shape[0])):
-        curr_index = book.index[i]
-        row = book.iloc[i, :]
-        bid_price = row['bids[0].price']
-        ask_price = row['asks[0].price']
-        prices_df.loc[curr_index, name + "_bid"] = bid_price
-        prices_df.loc[curr_index, name + "_ask"] = ask_price
-        prices_df.loc[curr_index, name + "_mid"] = (bid_price + ask_price) * 0.5
-        prices_df.loc[curr_index, name + "_featdummy"] = (bid_price + ask_price) * 0.5
-    return prices_df
+    book = read_book(filename, ['bids[0].price', 'asks[0].price'])
+    return price_columns(book, name)
 
 
-def generate_features(filename, name):
-    book = pd.read_csv(filename, header=0, index_col=['date'], parse_dates=['date'])
-    bid_price_cols = []
-    ask_price_cols = []
-    bid_amount_cols = []
-    ask_amount_cols = []
-
-    features_df = pd.DataFrame(index=book.index)
-
-    for i in range(0, 24):
-        bid_price_cols.append('bids[{i}].price'.format(i=i))
-        ask_price_cols.append('asks[{i}].price'.format(i=i))
-        bid_amount_cols.append('bids[{i}].amount'.format(i=i))
-        ask_amount_cols.append('asks[{i}].amount'.format(i=i))
-
-
-    for i in tqdm(range(0, book.shape[0])):
-        curr_index = book.index[i]
-        row = book.iloc[i, :]
-        bid_prices = row[bid_price_cols].values
-        ask_prices = row[ask_price_cols].values
-        bid_volumes = row[bid_amount_cols].values
-        ask_volumes = row[ask_amount_cols].values
-        mid_price = (bid_prices[0] + ask_prices[0]) / 2.0
-        features_df.loc[curr_index, name + "_mid"] = mid_price
-        features_df.loc[curr_index, name + "_bid"] = bid_prices[0]
-        features_df.loc[curr_index, name + "_ask"] = ask_prices[0]
-        features_df.loc[curr_index, "feat_spread"] = (ask_prices[0] - bid_prices[0])
-            
-        kv = bid_ask_imbalance(bid_volumes, ask_volumes, 1)
-        
-        for level in [3, 5, 8, 12]:
-            kv = bid_ask_imbalance(bid_volumes, ask_volumes, level)
-            features_df.loc[curr_index, kv[0]] = kv[1]
-            kv = weighted_imbalance(bid_prices, bid_volumes, ask_prices, ask_volumes, level)
-            features_df.loc[curr_index, kv[0]] = kv[1]
-            kv = orderbook_slope(bid_prices, bid_volumes, ask_prices, ask_volumes, level)
-            features_df.loc[curr_index, kv[0]] = kv[1]
-            kv = depth_weighted_spread(bid_prices, bid_volumes, ask_prices, ask_volumes, level)
-            features_df.loc[curr_index, kv[0]] = kv[1]
-        
-        for history in [300, 600, 1200]:
-            if i >= history:
-                hist_idx = book.index[i-history:i+1]
-                mid_prices = np.asarray(features_df.loc[hist_idx, name + "_mid"].values, dtype=np.float64)
-                spreads = np.asarray(features_df.loc[hist_idx, "spread"].values, dtype=np.float64)
-                
-                features_df.loc[curr_index, "feat_mdma_{i}".format(i=history)] = np.mean(mid_prices)
-                features_df.loc[curr_index, "feat_mdema_{i}".format(i=history)] = ewma(mid_prices, history)[-1]
-                features_df.loc[curr_index, "feat_mdvol_{i}".format(i=history)] = np.std(mid_prices)
-
-                features_df.loc[curr_index, "feat_spma_{i}".format(i=history)] = np.mean(spreads)
-                features_df.loc[curr_index, "feat_spema_{i}".format(i=history)] = ewma(spreads, history)[-1]
-                features_df.loc[curr_index, "feat_spvol_{i}".format(i=history)] = np.std(spreads)
-    
+def snapshot_features(book, name):
+    # the columns that only depend on the snapshot itself
+    bid_prices, bid_volumes, ask_prices, ask_volumes = depth_matrices(book, 24)
+
+    columns = {name + "_mid": (bid_prices[:, 0] + ask_prices[:, 0]) / 2.0,
+               name + "_bid": bid_prices[:, 0],
+               name + "_ask": ask_prices[:, 0],
+               "feat_spread": ask_prices[:, 0] - bid_prices[:, 0]}
+    columns.update(depth_features(bid_prices, bid_volumes, ask_prices, ask_volumes))
+    return pd.DataFrame(columns, index=book.index)
+
+
+def add_rolling_features(features_df, name, warmup=None):
+    # warmup holds the mid and spread of the rows just before features_df, so windows reach across files
+    for history in HISTORIES:
+        for prefix, col in [("md", name + "_mid"), ("sp", "feat_spread")]:
+            values = features_df[col].to_numpy(dtype=np.float64)
+            if warmup is not None:
+                values = np.concatenate((warmup[col].to_numpy(dtype=np.float64), values))
+            skip = len(values) - len(features_df)
+            mean, ema, vol = rolling_features(values, history)
+            features_df["feat_{p}ma_{i}".format(p=prefix, i=history)] = mean[skip:]
+            features_df["feat_{p}ema_{i}".format(p=prefix, i=history)] = ema[skip:]
+            features_df["feat_{p}vol_{i}".format(p=prefix, i=history)] = vol[skip:]
     return features_df
+
+
+def generate_features(filename, name):
+    book = read_book(filename)
+    return add_rolling_features(snapshot_features(book, name), name)
     
 
 def align_dataframes(primary_df, price_df):
@@ -178,6 +319,98 @@ def align_dataframes(primary_df, price_df):
     df.dropna(inplace = True)
     return df
 
+
+def day_files(path, start, end):
+    # (perp, future) snapshot files for every day from start to end inclusive
+    files = []
+    while start <= end:
+        file = "deribit_book_snapshot_25_" + start.strftime("%Y-%m-%d")
+        pfiles = [f for f in os.listdir(os.path.join(path, "perp")) if file in f]
+        ffiles = [f for f in os.listdir(path) if file in f]
+        assert(len(pfiles) == 1)
+        assert(len(ffiles) == 1)
+        files.append((os.path.join(path, "perp", pfiles[0]), os.path.join(path, ffiles[0])))
+        start += timedelta(days=1)
+    return files
+
+
+def process_file(filename, name, features):
+    # worker side: everything that needs only this one file
+    if not features:
+        return generate_prices(filename, name)
+    book = read_book(filename)
+    return snapshot_features(book, name)
+
+
+def warmup_rows(filename, name):
+    # the trailing mid and spread rows of a perp day, computed as snapshot_features does but from the
+    # top of book columns only
+    book = read_book(filename, ['bids[0].price', 'asks[0].price']).iloc[-max(HISTORIES):]
+    bid_price = book['bids[0].price'].to_numpy(dtype=np.float64)
+    ask_price = book['asks[0].price'].to_numpy(dtype=np.float64)
+    return pd.DataFrame({name + "_mid": (bid_price + ask_price) / 2.0,
+                         "feat_spread": ask_price - bid_price}, index=book.index)
+
+
+def finish_day(perp, future, warmup, carry, features, header):
+    # the steps that need the previous day's trailing perp rows and last future row
+    if features:
+        add_rolling_features(perp, "perp", warmup)
+    if carry is not None:
+        future = pd.concat([carry, future])
+    df = align_dataframes(perp, future)
+    return df, df.to_csv(header=header)
+
+
+def process_day(files, previous, features, header):
+    # worker side: one whole day, csv text included; the previous day's files are only read for the
+    # top of book rows the day needs from them, so no frame is shipped to a worker
+    perp = process_file(files[0], "perp", features)
+    future = process_file(files[1], "future", False)
+    warmup = None
+    carry = None
+    if previous is not None:
+        if features:
+            warmup = warmup_rows(previous[0], "perp")
+        carry = generate_prices(previous[1], "future").iloc[-1:]
+    return finish_day(perp, future, warmup, carry, features, header)
+
+
+def iter_days(files, features=False, workers=None):
+    # yields each aligned day with its csv text in time order as soon as it is done; at most two days per
+    # worker are in flight, so finished days never pile up ahead of the consumer
+    lookahead = 2 * (workers or os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        try:
+            for k, day in enumerate(files):
+                pending.append(executor.submit(process_day, day, files[k - 1] if k > 0 else None, features, k == 0))
+                if len(pending) == lookahead:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            for job in pending:
+                job.cancel()
+
+
+def generate_dataset(path, start, end, output, features=False, workers=None):
+    # appends every day to output.csv and output.bin as it arrives; on an error neither file is left behind
+    csv = open(output + ".csv", "w")
+    store = tick_store.Writer(output + ".bin")
+    try:
+        for df, text in iter_days(day_files(path, start, end), features, workers):
+            csv.write(text)
+            store.append(df)
+    except BaseException:
+        csv.close()
+        os.remove(output + ".csv")
+        store.abort()
+        raise
+    csv.close()
+    store.close()
+
+
 import sys
 import re 
 
@@ -187,25 +420,7 @@ if __name__ == "__main__":
     
     #generate_snapshot(perpfile, "perp_book.csv")
     #generate_snapshot(futurefile, "future_book.csv")
-    perps = []
-    futures = []
-    
     start = date(2023, 1, 21)
     end = date(2023, 2, 16)
     path = "/home/pravin/work/market-making-analysis/python/tardis_data/book_snapshot_25/"
-    
-    while start <= end:
-        file = "deribit_book_snapshot_25_" + start.strftime("%Y-%m-%d")
-        pfiles = [f for f in os.listdir(path + "perp/") if file in f]
-        ffiles = [f for f in os.listdir(path) if file in f]
-        assert(len(pfiles) == 1)
-        assert(len(ffiles) == 1)
-        perp = generate_prices(path + "perp/" + pfiles[0], "perp")
-        future = generate_prices(path + ffiles[0], "future")
-        perps.append(perp)
-        futures.append(future)
-        start += timedelta(days=1)
-    perp_feat_df = pd.concat(perps)
-    future_feat_df = pd.concat(futures)
-    df = align_dataframes(perp_feat_df, future_feat_df)
-    df.to_csv("data.csv", header=True)
+    generate_dataset(path, start, end, "data")
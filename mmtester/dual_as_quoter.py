@@ -41,10 +41,12 @@ class DualASQuoter():
         self.quote_size=max_quote_size
         self.spot_instr = spot_instr
         self.future_instr = future_instr
+        self.ladder_cache_key: Tuple = None
+        self.ladder_cache: Tuple[np.ndarray, np.ndarray, np.ndarray, List[int]] = None
     
 
-    def quote(self, timestamp: pd.DatetimeIndex, strategy: exchange.BaseStrategy, 
-              spot_price: float, future_price: float)-> Tuple[List[order.Order], List[order.Order]]:
+    def quote(self, timestamp: int, strategy: exchange.BaseStrategy, 
+              spot_price: float, future_price: float)-> Tuple[order.OrderBatch, order.OrderBatch]:
         spot_reserve_price = spot_price - (self.spot_q + self.spot_target_pct) * self.gamma * spot_price * (self.sigma**2) * self.tau
         future_reserve_price = future_price - (self.future_q + self.future_target_pct) * self.gamma * future_price * (self.sigma**2) * self.tau
         spread = self.gamma * (self.sigma**2) * self.tau + (2.0 / self.gamma) * math.log(1 + self.gamma / self.kappa)
@@ -58,59 +60,60 @@ class DualASQuoter():
                             base_future_bid_spread, base_future_ask_spread)
 
         
-    def compute(self, timestamp: pd.DatetimeIndex, strategy: exchange.BaseStrategy,
+    def ladder_key(self) -> Tuple:
+        return (self.spot_bid_price_skew_factor, self.spot_ask_price_skew_factor,
+                self.spot_bid_size_skew_factor, self.spot_ask_size_skew_factor,
+                self.future_bid_price_skew_factor, self.future_ask_price_skew_factor,
+                self.future_bid_size_skew_factor, self.future_ask_size_skew_factor,
+                self.spot_bid_levels, self.spot_ask_levels, self.future_bid_levels, self.future_ask_levels,
+                self.quote_size)
+
+
+    def ladders(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray, List[int]]:
+        # size weights and spread multipliers only depend on the parameters in ladder_key, so they are
+        # rebuilt only when one of those changes
+        key = self.ladder_key()
+        if key == self.ladder_cache_key:
+            return self.ladder_cache
+
+        sizes = []
+        multipliers = []
+        segments = []
+        for segment, (size_skew, price_skew, levels, sign) in enumerate([
+                (self.spot_bid_size_skew_factor, self.spot_bid_price_skew_factor, self.spot_bid_levels, -1.0),
+                (self.spot_ask_size_skew_factor, self.spot_ask_price_skew_factor, self.spot_ask_levels, 1.0),
+                (self.future_bid_size_skew_factor, self.future_bid_price_skew_factor, self.future_bid_levels, -1.0),
+                (self.future_ask_size_skew_factor, self.future_ask_price_skew_factor, self.future_ask_levels, 1.0)]):
+            weights = np.power(size_skew * 1.0, np.arange(1, levels + 1, 1))
+            weights /= np.sum(weights)
+            weights *= self.quote_size
+            sizes.append(weights)
+            multipliers.append(sign * np.power(price_skew, np.linspace(0, levels-1, levels)))
+            segments.append(np.full(levels, segment, dtype=np.int64))
+
+        bounds = list(np.cumsum([0] + [len(weights) for weights in sizes]))
+        self.ladder_cache = (np.concatenate(sizes), np.concatenate(multipliers), np.concatenate(segments), bounds)
+        self.ladder_cache_key = key
+        return self.ladder_cache
+
+
+    def compute(self, timestamp: int, strategy: exchange.BaseStrategy,
                 spot_price: float, future_price: float,
                 spot_reserve_price: float, future_reserve_price: float,  
                 spot_bid_spread: float, spot_ask_spread, future_bid_spread, 
-                future_ask_spread)-> Tuple[List[order.Order], List[order.Order], List[order.Order], List[order.Order]]:
-        spot_bid_size_weights = np.arange(1, self.spot_bid_levels + 1, 1)
-        spot_ask_size_weights = np.arange(1, self.spot_ask_levels + 1, 1)
-        future_bid_size_weights = np.arange(1, self.future_bid_levels + 1, 1)
-        future_ask_size_weights = np.arange(1, self.future_ask_levels + 1, 1)
-        spot_bid_size_weights = np.power(self.spot_bid_size_skew_factor * 1.0, spot_bid_size_weights)
-        spot_ask_size_weights = np.power(self.spot_ask_size_skew_factor * 1.0, spot_ask_size_weights)
-        future_bid_size_weights = np.power(self.future_bid_size_skew_factor * 1.0, future_bid_size_weights)
-        future_ask_size_weights = np.power(self.future_ask_size_skew_factor * 1.0, future_ask_size_weights)
-        
-        spot_bid_size_weights /= np.sum(spot_bid_size_weights)
-        spot_ask_size_weights /= np.sum(spot_ask_size_weights)
-        future_bid_size_weights /= np.sum(future_bid_size_weights)
-        future_ask_size_weights /= np.sum(future_ask_size_weights)
-        
-        spot_bid_size_weights *= self.quote_size 
-        spot_ask_size_weights *= self.quote_size 
-        future_bid_size_weights *= self.quote_size
-        future_ask_size_weights *= self.quote_size
-        
-        spot_bid_spreads = np.power(self.spot_bid_price_skew_factor, np.linspace(0, self.spot_bid_levels-1, self.spot_bid_levels))
-        spot_ask_spreads = np.power(self.spot_ask_price_skew_factor, np.linspace(0, self.spot_ask_levels-1, self.spot_ask_levels))
-        future_bid_spreads = np.power(self.future_bid_price_skew_factor, np.linspace(0, self.future_bid_levels-1, self.future_bid_levels))
-        future_ask_spreads = np.power(self.future_ask_price_skew_factor, np.linspace(0, self.future_ask_levels-1, self.future_ask_levels))
-        spot_bid_prices = np.round((spot_reserve_price - spot_bid_spreads * spot_bid_spread) * self.tick_multiplier) / self.tick_multiplier
-        spot_ask_prices = np.round((spot_reserve_price + spot_ask_spreads * spot_ask_spread) * self.tick_multiplier) / self.tick_multiplier
-        future_bid_prices = np.round((future_reserve_price - future_bid_spreads * future_bid_spread) * self.tick_multiplier) / self.tick_multiplier
-        future_ask_prices = np.round((future_reserve_price + future_ask_spreads * future_ask_spread) * self.tick_multiplier) / self.tick_multiplier
+                future_ask_spread)-> Tuple[order.OrderBatch, order.OrderBatch]:
+        sizes, multipliers, segments, bounds = self.ladders()
+        reserves = np.array([spot_reserve_price, spot_reserve_price, future_reserve_price, future_reserve_price])[segments]
+        spreads = np.array([spot_bid_spread, spot_ask_spread, future_bid_spread, future_ask_spread])[segments]
+        mids = np.array([spot_price, spot_price, future_price, future_price])[segments]
+        prices = np.round((reserves + multipliers * spreads) * self.tick_multiplier) / self.tick_multiplier
+        # the side comes from the segment, a zero price skew gives -0.0 multipliers on the bids
+        bids = segments % 2 == 0
+        # bids never quote above the mid and asks never below it
+        prices = np.where(bids, np.minimum(mids, prices), np.maximum(mids, prices))
 
-        
-        spot_bids = []
-        spot_asks = []
-        future_bids = []
-        future_asks = []
-        
-        for i in range(self.spot_bid_levels):
-            spot_bids.append(order.Order(timestamp, strategy.name, self.spot_instr, 
-                                         mm_enums.Side.BUY, min(spot_price, spot_bid_prices[i]), spot_bid_size_weights[i]))
-            
-        for i in range(self.spot_ask_levels):
-            spot_asks.append(order.Order(timestamp, strategy.name, self.spot_instr, 
-                                         mm_enums.Side.SELL, max(spot_price, spot_ask_prices[i]), spot_ask_size_weights[i]))
-        
-        for i in range(self.future_bid_levels):
-            future_bids.append(order.Order(timestamp, strategy.name, self.future_instr, 
-                                         mm_enums.Side.BUY, min(future_price, future_bid_prices[i]), future_bid_size_weights[i]))
-        
-        for i in range(self.future_ask_levels):                
-            future_asks.append(order.Order(timestamp, strategy.name, self.future_instr, 
-                                         mm_enums.Side.SELL, max(future_price, future_ask_prices[i]), future_ask_size_weights[i]))
-        
-        return (spot_bids, spot_asks, future_bids, future_asks)
\ No newline at end of file
+        sides = np.where(bids, mm_enums.Side.BUY.value, mm_enums.Side.SELL.value)
+        spot = slice(bounds[0], bounds[2])
+        future = slice(bounds[2], bounds[4])
+        return (order.OrderBatch(timestamp, strategy.name, self.spot_instr, sides[spot], prices[spot], sizes[spot]),
+                order.OrderBatch(timestamp, strategy.name, self.future_instr, sides[future], prices[future], sizes[future]))
@@ -0,0 +1,350 @@
+import math
+import numpy as np
+from typing import Dict, List
+from mmtester import base_instrument, data, mm_enums
+
+NEVER = np.iinfo(np.int64).max
+# order kinds in the order MultiMMStrategy's book sides are first created on the exchange
+SPOT_BUY, SPOT_SELL, FUTURE_BUY, FUTURE_SELL = 0, 1, 2, 3
+LADDERS = [("spot", "bid", SPOT_BUY), ("spot", "ask", SPOT_SELL),
+           ("future", "bid", FUTURE_BUY), ("future", "ask", FUTURE_SELL)]
+
+
+class EnsembleLeg:
+    def __init__(self, instrument: base_instrument.BaseInstrument, size: int, balance: float,
+                 init_qty: float, init_avg_price: float):
+        self.instrument: base_instrument.BaseInstrument = instrument
+        self.initial_balance: float = balance
+        self.balance: np.ndarray = np.full(size, balance, dtype=np.float64)
+        self.total_qty: np.ndarray = np.full(size, init_qty, dtype=np.float64)
+        self.avg_price: np.ndarray = np.full(size, init_avg_price, dtype=np.float64)
+        self.fees: np.ndarray = np.zeros(size, dtype=np.float64)
+        self.trade_num: np.ndarray = np.zeros(size, dtype=np.int64)
+        self.trade_qty: np.ndarray = np.zeros(size, dtype=np.float64)
+
+
+    def on_fill(self, ks: np.ndarray, buy: np.ndarray, price: np.ndarray, quantity: np.ndarray) -> None:
+        # Position.on_fill applied to one fill for each run in ks
+        qty = np.where(buy, quantity, -quantity)
+        total = self.total_qty[ks]
+        avg = self.avg_price[ks]
+        flat = total == 0
+        same = ~flat & (np.sign(total) == np.sign(qty))
+        opposite = ~flat & ~same
+        closed = opposite & (np.abs(total) == np.abs(qty))
+        reduced = opposite & (np.abs(total) > np.abs(qty))
+        flipped = opposite & (np.abs(total) < np.abs(qty))
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            averaged = (np.abs(qty) * price + np.abs(total) * avg) / np.abs(qty + total)
+            pnl_order = self.instrument.pnl(quantity, avg, price)
+            pnl_total = self.instrument.pnl(total, avg, price)
+
+        pnl = np.where(closed | reduced, pnl_order, np.where(flipped, pnl_total, 0.0))
+        avg = np.where(flat, price, np.where(same, averaged, avg))
+        avg = np.where(closed, 0.0, np.where(flipped, price, avg))
+
+        self.avg_price[ks] = avg
+        self.fees[ks] += self.instrument.fees(quantity, mm_enums.FillType.MAKER)
+        self.trade_num[ks] += 1
+        self.trade_qty[ks] += np.abs(qty)
+        self.total_qty[ks] = total + qty
+        self.balance[ks] += pnl
+
+
+class EnsembleLegResult:
+    def __init__(self, instrument: base_instrument.BaseInstrument, rows: int, size: int):
+        self.instrument: base_instrument.BaseInstrument = instrument
+        self.mid: np.ndarray = np.zeros(rows, dtype=np.float64)
+        self.balance: np.ndarray = np.zeros((rows, size), dtype=np.float64)
+        self.position: np.ndarray = np.zeros((rows, size), dtype=np.float64)
+        self.avg_price: np.ndarray = np.zeros((rows, size), dtype=np.float64)
+        self.fee: np.ndarray = np.zeros((rows, size), dtype=np.float64)
+        self.trade_num: np.ndarray = np.zeros((rows, size), dtype=np.int64)
+        self.trade_qty: np.ndarray = np.zeros((rows, size), dtype=np.float64)
+
+
+    def record(self, row: int, mid: float, leg: EnsembleLeg) -> None:
+        self.mid[row] = mid
+        self.balance[row] = leg.balance
+        self.position[row] = leg.total_qty
+        self.avg_price[row] = leg.avg_price
+        self.fee[row] = leg.fees
+        self.trade_num[row] = leg.trade_num
+        self.trade_qty[row] = leg.trade_qty
+
+
+    def trim(self, rows: int) -> None:
+        for name in ["mid", "balance", "position", "avg_price", "fee", "trade_num", "trade_qty"]:
+            setattr(self, name, getattr(self, name)[:rows])
+
+
+    def equity(self, include_fee: bool=True) -> np.ndarray:
+        fee = self.fee if include_fee else 0
+        return self.instrument.equity(self.mid[:, None], self.balance, self.position, self.avg_price, fee)
+
+
+class EnsembleBacktester:
+    def __init__(self, spot_instr: base_instrument.BaseInstrument, future_instr: base_instrument.BaseInstrument,
+                 configs: List[Dict], spot_balance: float, max_leverage: float, total_time_in_seconds: float,
+                 market_data_latency_ms: float=500, order_fill_latency_ms: float=500, requote_steps: int=300,
+                 init_spot_position: float=0, init_spot_avg_price: float=0,
+                 init_future_position: float=0, init_future_avg_price: float=0, wrap_horizon: bool=False):
+        self.spot_instr = spot_instr
+        self.future_instr = future_instr
+        self.configs: List[Dict] = configs
+        self.size: int = len(configs)
+        self.max_leverage: float = max_leverage
+        self.total_time: float = total_time_in_seconds
+        self.wrap_horizon: bool = wrap_horizon
+        self.market_data_latency: float = market_data_latency_ms
+        self.order_fill_latency: float = order_fill_latency_ms
+        self.requote_steps: int = requote_steps
+        self.spot = EnsembleLeg(spot_instr, self.size, spot_balance, init_spot_position, init_spot_avg_price)
+        self.future = EnsembleLeg(future_instr, self.size, spot_balance, init_future_position, init_future_avg_price)
+        self.build_parameters()
+
+
+    def build_parameters(self) -> None:
+        # per-run scalars are evaluated with the same float operations as DualASQuoter so K=1 matches a single run
+        def column(key: str) -> np.ndarray:
+            return np.array([float(config[key]) for config in self.configs], dtype=np.float64)
+
+        self.gamma = column("gamma")
+        self.sigma2 = np.array([float(config["volatility"])**2 for config in self.configs])
+        self.log_term = np.array([(2.0 / config["gamma"]) * math.log(1 + config["gamma"] / config["kappa"])
+                                  for config in self.configs])
+        self.tick_multiplier = np.array([1.0 / config["tick_size"] for config in self.configs])
+        self.spot_target = column("spot_target_pct")
+        self.future_target = column("future_target_pct")
+
+        self.levels = max(int(config[leg + "_" + side + "_levels"]) for config in self.configs for leg, side, _ in LADDERS)
+        self.width = 4 * self.levels
+        self.kinds = np.repeat(np.array([kind for _, _, kind in LADDERS], dtype=np.int8), self.levels)
+        self.multipliers = np.zeros((self.size, self.width))
+        self.sizes = np.zeros((self.size, self.width))
+
+        for k, config in enumerate(self.configs):
+            for leg, side, kind in LADDERS:
+                levels = int(config[leg + "_" + side + "_levels"])
+                weights = np.arange(1, levels + 1, 1)
+                weights = np.power(config[leg + "_" + side + "_size_skew"] * 1.0, weights)
+                weights /= np.sum(weights)
+                weights *= config["max_quote_size"]
+                spreads = np.power(config[leg + "_" + side + "_price_skew"], np.linspace(0, levels-1, levels))
+                start = kind * self.levels
+                self.sizes[k, start:start + levels] = weights
+                self.multipliers[k, start:start + levels] = spreads
+
+
+    def allocate(self, capacity: int) -> None:
+        size = self.size
+        self.price = np.zeros((size, capacity))
+        self.quantity = np.zeros((size, capacity))
+        self.kind = np.zeros((size, capacity), dtype=np.int8)
+        self.sequence = np.zeros((size, capacity), dtype=np.int64)
+        self.activate_time = np.full((size, capacity), NEVER, dtype=np.int64)
+        self.cancel_time = np.full((size, capacity), NEVER, dtype=np.int64)
+        # key is the fill trigger (-price for bids, price for asks); +inf marks a slot that cannot fill
+        self.key = np.full((size, capacity), np.inf)
+        self.live = np.zeros((size, capacity), dtype=bool)
+        # lowest resting key per run and order kind, so a tick only scans the runs whose touch crossed
+        self.best = np.full((size, 4), np.inf)
+        # earliest pending cancel and activation per run
+        self.next_cancel = np.full(size, NEVER, dtype=np.int64)
+        self.next_activate = np.full(size, NEVER, dtype=np.int64)
+
+
+    def grow(self, capacity: int) -> None:
+        extra = capacity - self.live.shape[1]
+        pads = {"price": 0.0, "quantity": 0.0, "kind": 0, "sequence": 0, "activate_time": NEVER,
+                "cancel_time": NEVER, "key": np.inf, "live": False}
+        for name, pad in pads.items():
+            values = getattr(self, name)
+            block = np.full((self.size, extra), pad, dtype=values.dtype)
+            setattr(self, name, np.concatenate([values, block], axis=1))
+
+
+    def refresh(self, ks: np.ndarray) -> None:
+        keys = self.key[ks]
+        kinds = self.kind[ks]
+        for kind in range(4):
+            self.best[ks, kind] = np.where(kinds == kind, keys, np.inf).min(axis=1)
+
+
+    def cancel_all(self, ks: np.ndarray, now: int) -> None:
+        due = now + self.cancel_delay
+        block = self.cancel_time[ks]
+        # as in Exchange.cancel_batch a repeated request moves the deadline of orders already being cancelled
+        block[self.live[ks]] = due
+        self.cancel_time[ks] = block
+        self.next_cancel[ks] = block.min(axis=1)
+
+
+    def quote(self, ks: np.ndarray, step: int, counter: int, row: int) -> None:
+        tau = (counter * self.frequency)
+        if self.wrap_horizon:
+            tau %= (self.total_time * 1000)
+        tau /= (self.total_time * 1000)
+        tau = 1 - tau
+
+        prices = np.empty((len(ks), self.width))
+        for leg, target, mids, bids, asks, first in [(self.spot, self.spot_target, self.spot_mid, self.spot_bid, self.spot_ask, SPOT_BUY),
+                                                     (self.future, self.future_target, self.future_mid, self.future_bid, self.future_ask, FUTURE_BUY)]:
+            mid = mids[row]
+            q = leg.total_qty[ks] / (leg.initial_balance * self.max_leverage)
+            reserve = mid - (q + target[ks]) * self.gamma[ks] * mid * self.sigma2[ks] * tau
+            spread = self.gamma[ks] * self.sigma2[ks] * tau + self.log_term[ks]
+            bid_spread = np.maximum(mid - (reserve - spread * 0.5), 0.05)
+            ask_spread = np.maximum((reserve + spread * 0.5) - mid, 0.05)
+            tm = self.tick_multiplier[ks][:, None]
+
+            bid_cols = slice(first * self.levels, (first + 1) * self.levels)
+            ask_cols = slice((first + 1) * self.levels, (first + 2) * self.levels)
+            bid_prices = np.round((reserve[:, None] - self.multipliers[ks, bid_cols] * bid_spread[:, None]) * tm) / tm
+            ask_prices = np.round((reserve[:, None] + self.multipliers[ks, ask_cols] * ask_spread[:, None]) * tm) / tm
+            prices[:, bid_cols] = np.minimum(np.minimum(mid, bid_prices), bids[row])
+            prices[:, ask_cols] = np.maximum(np.maximum(mid, ask_prices), asks[row])
+
+        sizes = self.sizes[ks]
+        valid = sizes > 0
+        # move each run's valid orders to the front, keeping submission order
+        order = np.argsort(~valid, axis=1, kind="stable")
+        prices = np.take_along_axis(prices, order, axis=1)
+        sizes = np.take_along_axis(sizes, order, axis=1)
+        valid = np.take_along_axis(valid, order, axis=1)
+        kinds = self.kinds[order]
+        sequence = step * self.width + order
+
+        needed = int(np.max(self.live[ks].sum(axis=1) + valid.sum(axis=1)))
+        if needed > self.live.shape[1]:
+            self.grow(max(needed, 2 * self.live.shape[1]))
+
+        slots = np.argsort(self.live[ks], axis=1, kind="stable")[:, :self.width]
+        rows = np.broadcast_to(ks[:, None], slots.shape)
+        rows, slots = rows[valid], slots[valid]
+        self.price[rows, slots] = prices[valid]
+        self.quantity[rows, slots] = sizes[valid]
+        self.kind[rows, slots] = kinds[valid]
+        self.sequence[rows, slots] = sequence[valid]
+        self.activate_time[rows, slots] = self.timestamps[step] + self.fill_delay
+        self.cancel_time[rows, slots] = NEVER
+        self.key[rows, slots] = np.inf
+        self.live[rows, slots] = True
+        self.next_activate[ks] = np.minimum(self.next_activate[ks], self.timestamps[step] + self.fill_delay)
+
+
+    def process_events(self, now: int) -> None:
+        rows = np.flatnonzero(self.next_cancel <= now)
+        if len(rows) > 0:
+            cancel_time = self.cancel_time[rows]
+            done = self.live[rows] & (cancel_time <= now)
+            self.live[rows] &= ~done
+            self.key[rows] = np.where(done, np.inf, self.key[rows])
+            self.activate_time[rows] = np.where(done, NEVER, self.activate_time[rows])
+            self.cancel_time[rows] = np.where(done, NEVER, cancel_time)
+            self.next_cancel[rows] = self.cancel_time[rows].min(axis=1)
+            self.refresh(rows)
+
+        rows = np.flatnonzero(self.next_activate <= now)
+        if len(rows) > 0:
+            activate_time = self.activate_time[rows]
+            active = self.live[rows] & (activate_time <= now)
+            kinds = self.kind[rows]
+            prices = np.where((kinds == SPOT_BUY) | (kinds == FUTURE_BUY), -self.price[rows], self.price[rows])
+            self.key[rows] = np.where(active, prices, self.key[rows])
+            self.activate_time[rows] = np.where(active, NEVER, activate_time)
+            self.next_activate[rows] = self.activate_time[rows].min(axis=1)
+            self.refresh(rows)
+
+
+    def fill_orders(self, row: int) -> None:
+        thresholds = np.array([-self.spot_ask[row], self.spot_bid[row], -self.future_ask[row], self.future_bid[row]])
+        runs = np.flatnonzero((self.best <= thresholds).any(axis=1))
+        if len(runs) == 0:
+            return
+
+        ks, slots = np.nonzero(self.key[runs] <= thresholds[self.kind[runs]])
+        ks = runs[ks]
+        kinds = self.kind[ks, slots]
+        # like Exchange.fill_orders, a run's crossed orders fill in submission order
+        order = np.lexsort((self.sequence[ks, slots], ks))
+        ks, slots, kinds = ks[order], slots[order], kinds[order]
+        starts = np.flatnonzero(np.r_[True, ks[1:] != ks[:-1]])
+        rank = np.arange(len(ks)) - np.repeat(starts, np.diff(np.r_[starts, len(ks)]))
+
+        # fills for one run are applied in exchange order; runs are independent so each rank is one vector step
+        for r in range(int(rank.max()) + 1):
+            at = rank == r
+            for leg, buy_kind, sell_kind in [(self.spot, SPOT_BUY, SPOT_SELL), (self.future, FUTURE_BUY, FUTURE_SELL)]:
+                sel = at & ((kinds == buy_kind) | (kinds == sell_kind))
+                if sel.any():
+                    k, slot = ks[sel], slots[sel]
+                    leg.on_fill(k, kinds[sel] == buy_kind, self.price[k, slot], self.quantity[k, slot])
+
+        self.live[ks, slots] = False
+        self.key[ks, slots] = np.inf
+        self.cancel_time[ks, slots] = NEVER
+        self.next_cancel[runs] = self.cancel_time[runs].min(axis=1)
+        self.refresh(runs)
+        self.requote[ks] = True
+
+
+    def run(self, dataObject: data.Data, record_interval: int=1) -> List[EnsembleLegResult]:
+        assert(dataObject.columnar)
+        for instrument in [self.spot_instr, self.future_instr]:
+            dataObject.bind_instrument(instrument)
+
+        self.frequency = dataObject.frequency
+        self.timestamps = dataObject.timestamps
+        lag = int(math.ceil(self.market_data_latency / self.frequency))
+        self.fill_delay = int(round(self.order_fill_latency * 1000000))
+        self.cancel_delay = int(round(self.market_data_latency * 1000000))
+        self.spot_bid, self.spot_ask, self.spot_mid = [dataObject.values[:, col] for col in
+                                                       [self.spot_instr.bid_col, self.spot_instr.ask_col, self.spot_instr.mid_col]]
+        self.future_bid, self.future_ask, self.future_mid = [dataObject.values[:, col] for col in
+                                                             [self.future_instr.bid_col, self.future_instr.ask_col, self.future_instr.mid_col]]
+
+        self.allocate(2 * self.width)
+        self.requote = np.ones(self.size, dtype=bool)
+        self.wait_step = np.zeros(self.size, dtype=np.int64)
+
+        steps = dataObject.get_rows()
+        rows = max((steps - lag + record_interval - 1) // record_interval, 0)
+        self.record_timestamps = np.zeros(rows, dtype=np.int64)
+        results = [EnsembleLegResult(self.spot_instr, rows, self.size),
+                   EnsembleLegResult(self.future_instr, rows, self.size)]
+        recorded = 0
+
+        for step in range(steps):
+            if step >= lag:
+                counter = step - lag
+                if counter > 0:
+                    requoting = self.requote.copy()
+                    if requoting.any():
+                        self.cancel_all(np.flatnonzero(requoting), self.timestamps[step])
+                        self.requote[requoting] = False
+                        self.wait_step[requoting] = 0
+
+                    quoting = ~requoting & (self.wait_step == self.requote_steps)
+                    if quoting.any():
+                        self.wait_step[quoting] = 0
+                        self.quote(np.flatnonzero(quoting), step, counter, counter)
+                    self.wait_step[~requoting & ~quoting] += 1
+
+                if counter % record_interval == 0:
+                    self.record_timestamps[recorded] = self.timestamps[step]
+                    results[0].record(recorded, self.spot_mid[counter], self.spot)
+                    results[1].record(recorded, self.future_mid[counter], self.future)
+                    recorded += 1
+
+            if step == steps - 1:
+                break
+
+            self.process_events(self.timestamps[step])
+            self.fill_orders(step)
+
+        self.record_timestamps = self.record_timestamps[:recorded]
+        for result in results:
+            result.trim(recorded)
+        return results
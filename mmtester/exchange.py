@@ -2,8 +2,8 @@ import math
 import numpy as np
 import pandas as pd
 from abc import ABC, abstractmethod
-from typing import List, Set, Dict
-from mmtester import mm_enums, data, exchange, order, record
+from typing import List, Dict, Tuple
+from mmtester import mm_enums, data, exchange, order, order_book, record, base_instrument, scheduler
 
 
 class BaseStrategy(ABC):
@@ -11,6 +11,7 @@ class BaseStrategy(ABC):
         self.name = name
         self.exchange = None
         self.data_frequency = 0
+        self.instruments: List[base_instrument.BaseInstrument] = []
     
     
     @abstractmethod
@@ -23,6 +24,11 @@ class BaseStrategy(ABC):
         raise RuntimeError("abstract method")
     
     
+    def on_cancel_batch(self, batch: order.OrderBatch, indices: np.ndarray):
+        for i in indices:
+            self.on_cancel(batch.get_order(i))
+
+
     @abstractmethod 
     def on_exchange_init(self, exch, data_frequency):
         self.exchange = exch
@@ -32,93 +38,208 @@ class BaseStrategy(ABC):
     @abstractmethod
     def on_fill(self, order: order.Order, fill_type: mm_enums.FillType):
         raise RuntimeError("abstract method")
+
+
+    def next_tick(self, counter: int) -> int:
+        # earliest record counter at which on_tick must run; returning counter disables skipping
+        return counter
+
+
+    def on_skip(self, block: record.RecordBlock):
+        raise RuntimeError("strategy does not support fast forward")
     
 
 class Exchange:
-    def __init__(self, market_data_latency_ms: float, order_fill_latency_ms: float):
+    def __init__(self, market_data_latency_ms: float, order_fill_latency_ms: float, fast_forward: bool=False,
+                 recycle_orders: bool=False):
         self.curr_step: int = 0
         self.market_data_latency: float = market_data_latency_ms
         self.order_fill_latency: float = order_fill_latency_ms
+        self.fast_forward: bool = fast_forward
+        # with recycling, orders handed to on_fill/on_cancel are reused afterwards and must not be kept
+        self.pool: order.OrderPool = order.OrderPool() if recycle_orders else None
         self.strategies: Dict[str, exchange.BaseStrategy] = {}
 
     
-    def start(self, dataObject: data.Data):
+    def start(self, dataObject: data.Data, frequency_milliseconds: int=None):
+        # chunks given as DataFrames take frequency_milliseconds, or the spacing of the first chunk's index
+        if not isinstance(dataObject, (data.Data, data.DataStream)):
+            dataObject = data.DataStream(dataObject, frequency_milliseconds)
+
         self.dataObject: data.Data = dataObject
         self.sample_frequency: float = dataObject.frequency
         self.market_latency_steps: int = int(math.ceil(self.market_data_latency / self.sample_frequency))
         self.curr_step = 0
-        self.max_step: int = dataObject.get_rows() - 1
-        self.orders: List[order.Order] = []
-        self.cancels: Dict[order.Order, pd.DatetimeIndex] = {}
-        
+        # latencies as int64 nanosecond offsets on the same time base as Record.timestamp
+        self.fill_delay: int = int(round(self.order_fill_latency * 1000000))
+        self.cancel_delay: int = int(round(self.market_data_latency * 1000000))
+        self.book: order_book.OrderBook = order_book.OrderBook()
+        # batches with at least one NEW order, per strategy
+        self.batches: Dict[str, Dict[order.OrderBatch, None]] = {}
+        self.next_id: int = 0
+        # live order per (side, level) of each strategy's ladder on each instrument, for incremental requotes
+        self.ladders: Dict[Tuple[str, base_instrument.BaseInstrument], Dict[Tuple[int, int], Tuple[order.OrderBatch, int, float]]] = {}
+        self.events: scheduler.EventScheduler = scheduler.EventScheduler()
+
+        if isinstance(dataObject, data.DataStream):
+            dataObject.retain = self.market_latency_steps + 1
+        elif self.fast_forward:
+            assert(dataObject.columnar)
+
+        for strat in self.strategies.values():
+            for instrument in strat.instruments:
+                self.dataObject.bind_instrument(instrument)
+
         for strat  in self.strategies.values():
             strat.on_exchange_init(self, self.dataObject.frequency)
                         
     
     def get_instruments(self):
-        return self.data.get_instrument_names()
+        return self.dataObject.get_instrument_names()
     
     
     def get_feature_names(self):
-        return self.data.get_feature_names()
+        return self.dataObject.get_feature_names()
     
     
-    def cancel_order(self, timestamp: pd.DatetimeIndex, order: order.Order):
+    def cancel_order(self, timestamp: int, order: order.Order):
         assert(order.strategy_name in self.strategies)
-        if order.state == mm_enums.OrderState.NEW:
-            self.cancels[order] = timestamp
+        if order.batch is not None:
+            self.cancel_batch(timestamp, order.batch, np.array([order.index]))
+
+
+    def cancel_batch(self, timestamp: int, batch: order.OrderBatch, indices: np.ndarray):
+        # a repeated request moves the deadline, so an order already being cancelled stays live until the latest
+        indices = indices[batch.states[indices] == mm_enums.OrderState.NEW.value]
+        if len(indices) > 0:
+            batch.cancel_time[indices] = timestamp + self.cancel_delay
+            self.events.schedule(timestamp + self.cancel_delay, mm_enums.EventType.CANCEL, (batch, indices))
         
         
-    def cancel_all(self, timestamp: pd.DatetimeIndex, strategy_name: str):
-        for order in self.orders[:]:
-            if order.strategy_name == strategy_name:
-                self.cancels[order] = timestamp
+    def amend_batch(self, timestamp: int, batch: order.OrderBatch, indices: np.ndarray, quantities: np.ndarray):
+        # size-only change applied in place after the same latency as a cancel, keeping the queue position
+        self.events.schedule(timestamp + self.cancel_delay, mm_enums.EventType.AMEND, (batch, indices, quantities))
+
+
+    def cancel_all(self, timestamp: int, strategy_name: str):
+        for batch in list(self.batches.get(strategy_name, {})):
+            self.cancel_batch(timestamp, batch, batch.open_indices())
     
         
-    def process_cancels(self):
-        cancelled = []
-        record = self.dataObject.get_record(self.curr_step, self.curr_step)
-        for order in self.cancels:
-            if record.timestamp >= self.cancels[order] + pd.Timedelta(self.market_data_latency, unit="milliseconds"):
-                if order.state != mm_enums.OrderState.FILLED:
-                    order.state = mm_enums.OrderState.CANCELED
-                    self.orders.remove(order)
-                    self.strategies[order.strategy_name].on_cancel(order)
-
-                cancelled.append(order)
-        
-        for order in cancelled:
-            del self.cancels[order]
+    def release(self, batch: order.OrderBatch, count: int):
+        batch.open -= count
+        if batch.open == 0:
+            del self.batches[batch.strategy_name][batch]
+
+
+    def process_events(self, record: record.Record=None):
+        if record is None:
+            record = self.dataObject.get_record(self.curr_step, self.curr_step)
+        for kind, payload in self.events.pop_due(record.timestamp):
+            batch, indices = payload[0], payload[1]
+            live = batch.states[indices] == mm_enums.OrderState.NEW.value
+            indices = indices[live]
+            if kind == mm_enums.EventType.AMEND:
+                batch.set_quantities(indices, payload[2][live])
+            elif kind == mm_enums.EventType.CANCEL:
+                # orders whose cancel was requested again since are left to the later event
+                indices = indices[batch.cancel_time[indices] <= record.timestamp]
+                batch.cancel_time[indices] = -1
+                if len(indices) == 0:
+                    continue
+                batch.set_state(indices, mm_enums.OrderState.CANCELED)
+                for i in indices[batch.active[indices]]:
+                    self.book.remove(batch, i)
+                batch.active[indices] = False
+                self.release(batch, len(indices))
+                self.strategies[batch.strategy_name].on_cancel_batch(batch, indices)
+                for i in indices:
+                    batch.recycle(i)
+            else:
+                for i in indices.tolist():
+                    self.book.add(batch, i)
+                batch.active[indices] = True
             
             
     def add_quotes(self, bids: List[order.Order], asks: List[order.Order]):
-       
+        orders = bids + asks
+        for instrument in dict.fromkeys(o.instrument for o in orders):
+            self.add_batch(order.OrderBatch.from_orders([o for o in orders if o.instrument == instrument]))
+
+
+    def clamp(self, batch: order.OrderBatch):
         record = self.get_record()
-        
-        for i in range(len(bids)):
-            bid = record.get_instrument_data(bids[i].instrument, "bid")
-            if bids[i].price > bid:
-                bids[i].price = bid
-                
-            if bids[i].quantity > 0:
-                self.add_order(bids[i])
-                
-                
-        for i in range(len(asks)):    
-            ask = record.get_instrument_data(asks[i].instrument, "ask")
-            if asks[i].price < ask:
-                asks[i].price = ask
-            
-            if asks[i].quantity > 0:
-                self.add_order(asks[i])
+        bid = record.get_bid(batch.instrument)
+        ask = record.get_ask(batch.instrument)
+        batch.set_prices(np.where(batch.is_buy(), np.minimum(batch.prices, bid), np.maximum(batch.prices, ask)))
+
+
+    def add_batch(self, batch: order.OrderBatch):
+        self.clamp(batch)
+        live = batch.quantities > 0
+        if not live.all():
+            batch = batch.subset(live)
+        if len(batch) > 0:
+            self.submit(batch)
+
+
+    def requote_batch(self, timestamp: int, batch: order.OrderBatch):
+        # diff the new ladder against the live one level by level: unchanged orders stay, size-only
+        # changes are amended and only moved, missing or new levels are cancelled or added
+        self.clamp(batch)
+        ladder = self.ladders.setdefault((batch.strategy_name, batch.instrument), {})
+        added = np.zeros(len(batch), dtype=bool)
+        quoted = set()
+        for i in range(len(batch)):
+            if batch.quantities[i] <= 0:
+                continue
+
+            key = (int(batch.sides[i]), int(batch.levels[i]))
+            quoted.add(key)
+            live = ladder.get(key)
+            if live is not None:
+                old, j, quantity = live
+                if old.states[j] == mm_enums.OrderState.NEW.value and old.cancel_time[j] < 0:
+                    if old.prices[j] == batch.prices[i]:
+                        # compare with the size last asked for, an amend still in flight has not changed quantities
+                        if quantity != batch.quantities[i]:
+                            self.amend_batch(timestamp, old, np.array([j]), batch.quantities[i:i + 1].copy())
+                            ladder[key] = (old, j, batch.quantities[i])
+                        continue
+                    self.cancel_batch(timestamp, old, np.array([j]))
+            added[i] = True
+
+        for key in [key for key in ladder if key not in quoted]:
+            old, j, _ = ladder.pop(key)
+            self.cancel_batch(timestamp, old, np.array([j]))
+
+        if added.any():
+            batch = batch.subset(added)
+            self.submit(batch)
+            for i in range(len(batch)):
+                ladder[(int(batch.sides[i]), int(batch.levels[i]))] = (batch, i, batch.quantities[i])
         
         
-    def add_order(self, order: order.Order):
-        assert(order.strategy_name in self.strategies)
-        assert(order.state == mm_enums.OrderState.NEW)
-        self.orders.append(order)
+    def add_order(self, new_order: order.Order):
+        self.submit(order.OrderBatch.from_orders([new_order]))
+
+
+    def submit(self, batch: order.OrderBatch):
+        assert(batch.strategy_name in self.strategies)
+        assert((batch.states == mm_enums.OrderState.NEW.value).all())
+        batch.first_id = self.next_id
+        batch.pool = self.pool
+        self.next_id += len(batch)
+        self.batches.setdefault(batch.strategy_name, {})[batch] = None
+        # the batch only rests in the book once its fill latency has elapsed
+        self.events.schedule(batch.timestamp + self.fill_delay, mm_enums.EventType.ACTIVATE,
+                             (batch, np.arange(len(batch))))
     
     
+    def get_orders(self, strategy_name: str) -> List[order.Order]:
+        return [batch.get_order(i) for batch in self.batches.get(strategy_name, {}) for i in batch.open_indices()]
+
+
     def register(self, strategy: BaseStrategy):
         if not strategy.name in self.strategies:
             self.strategies[strategy.name] = strategy
@@ -132,27 +253,75 @@ class Exchange:
         return self.dataObject.get_record(self.curr_step, step)
 
 
-    def fill_orders(self):    
-        record = self.dataObject.get_record(self.curr_step, self.curr_step)
-        
-        for order in self.orders[:]:
-            assert(order.state == mm_enums.OrderState.NEW)
-            if record.timestamp >= order.timestamp + pd.Timedelta(self.order_fill_latency, unit="milliseconds"):
-                bid = record.get_instrument_data(order.instrument, "bid")
-                ask = record.get_instrument_data(order.instrument, "ask")
-                
-                if order.side == mm_enums.Side.BUY and order.price >= ask:
-                    order.state = mm_enums.OrderState.FILLED
-                    self.strategies[order.strategy_name].on_fill(order, mm_enums.FillType.MAKER)
-                    self.orders.remove(order)
-                elif order.side == mm_enums.Side.SELL and order.price <= bid:
-                    order.state = mm_enums.OrderState.FILLED
-                    self.strategies[order.strategy_name].on_fill(order, mm_enums.FillType.MAKER)
-                    self.orders.remove(order)
+    def fill_orders(self, record: record.Record=None):
+        if record is None:
+            record = self.dataObject.get_record(self.curr_step, self.curr_step)
+
+        # only the price-sorted prefix of each book side that crosses the touch is visited
+        crossed = []
+        for (instrument, side), book_side in self.book.sides.items():
+            if side == mm_enums.Side.BUY:
+                crossed.extend(book_side.crossing(record.get_ask(instrument)))
+            else:
+                crossed.extend(book_side.crossing(record.get_bid(instrument)))
+
+        # fills are applied in submission order, which is the order ids were handed out in
+        for order_id in sorted(crossed):
+            batch, i = self.book.resolve(order_id)
+            assert(batch.states[i] == mm_enums.OrderState.NEW.value)
+            batch.set_state(i, mm_enums.OrderState.FILLED)
+            self.book.remove(batch, i)
+            batch.active[i] = False
+            self.release(batch, 1)
+            self.strategies[batch.strategy_name].on_fill(batch.get_order(i), mm_enums.FillType.MAKER)
+            batch.recycle(i)
         
         
+    def next_cross_step(self, start: int, stop: int) -> int:
+        # first step in [start, stop) at which the touch reaches the best resting price of any book side
+        for (instrument, side), book_side in self.book.sides.items():
+            best = book_side.best_price()
+            if best is None:
+                continue
+
+            col = instrument.ask_col if side == mm_enums.Side.BUY else instrument.bid_col
+            begin = start
+            width = 256
+            while begin < stop:
+                end = min(begin + width, stop)
+                prices = self.dataObject.get_column_range(col, begin, end)
+                hits = np.flatnonzero(prices <= best if side == mm_enums.Side.BUY else prices >= best)
+                if len(hits) > 0:
+                    stop = begin + int(hits[0])
+                    break
+                begin = end
+                width *= 2
+        return stop
+
+
+    def skip_idle_steps(self):
+        first = self.curr_step
+        lag = self.market_latency_steps
+        if first < lag:
+            return
+
+        target = self.dataObject.get_last_row()
+        due = self.events.next_due()
+        if due is not None:
+            target = min(target, max(self.dataObject.search_timestamp(due), first))
+        for strategy in self.strategies.values():
+            target = min(target, strategy.next_tick(first - lag) + lag)
+        target = self.next_cross_step(first, target)
+
+        if target > first:
+            block = self.dataObject.get_block(first, first - lag, target - first)
+            for strategy in self.strategies.values():
+                strategy.on_skip(block)
+            self.curr_step = target
+
+
     def step(self) -> bool:
-        if self.curr_step >= self.max_step:
+        if not self.dataObject.has_row(self.curr_step + 1):
             for strat in self.strategies.values():
                 strat.on_tick(self.get_record())
             return False
@@ -162,8 +331,11 @@ class Exchange:
         for strategy in self.strategies.values():
             strategy.on_tick(record)
         
-        self.process_cancels()
-        self.fill_orders()
+        current = self.dataObject.get_record(self.curr_step, self.curr_step)
+        self.process_events(current)
+        self.fill_orders(current)
         
         self.curr_step += 1
+        if self.fast_forward:
+            self.skip_idle_steps()
         return True
@@ -19,4 +19,16 @@ class OrderState(Enum):
     NEW = 1
     CANCELED = 2
     FILLED = 3
-    
\ No newline at end of file
+    
+
+class EventType(Enum):
+    ACTIVATE = 1
+    CANCEL = 2
+    AMEND = 3
+
+
+class RecordPolicy(Enum):
+    ALL = 1
+    INTERVAL = 2
+    BUCKET = 3
+    CHANGE = 4
@@ -1,5 +1,5 @@
-from typing import List
-from mmtester import exchange, mm_enums, exchange, order, position, base_instrument, record, dual_as_quoter
+from typing import List, Tuple
+from mmtester import exchange, mm_enums, exchange, order, position, base_instrument, record, dual_as_quoter, timeline
 import pandas as pd
 
 class MultiMMStrategy(exchange.BaseStrategy):
@@ -7,29 +7,49 @@ class MultiMMStrategy(exchange.BaseStrategy):
                  init_spot_position: float, init_spot_avg_price: float,
                  init_future_position: float, init_future_avg_price: float,
                  spot_instr: base_instrument.BaseInstrument, future_instr: base_instrument.BaseInstrument,
-                 total_time_in_seconds: float, quote_frequency: int, length: int):
+                 total_time_in_seconds: float, quote_frequency: int, length: int, rolling: bool=False,
+                 incremental: bool=False, online: bool=False, history: bool=True,
+                 record_policy: mm_enums.RecordPolicy=mm_enums.RecordPolicy.ALL, record_interval: int=1,
+                 shared_timeline: bool=False, wrap_horizon: bool=False):
         super().__init__(name)
         self.spot_instr = spot_instr
         self.future_instr = future_instr
+        self.instruments = [spot_instr, future_instr]
         self.quoter: dual_as_quoter.DualASQuoter = quoter
         self.total_time: float = total_time_in_seconds
         self.frequency: int = quote_frequency
+        # restart the AS horizon every total_time instead of letting tau run negative on long streams
+        self.wrap_horizon: bool = wrap_horizon
         self.max_leverage: float = max_leverage
         self.spot_position: position.Position = position.Position(spot_balance, self.spot_instr, 
                                                                   init_spot_position,
                                                                   init_spot_avg_price, 
-                                                                  length)
+                                                                  length, rolling, online, history and not shared_timeline,
+                                                                  record_policy, record_interval)
         
         self.future_position: position.Position = position.Position(spot_balance, self.future_instr,
                                                                     init_future_position,
                                                                     init_future_avg_price,
-                                                                    length)
+                                                                    length, rolling, online, history and not shared_timeline,
+                                                                    record_policy, record_interval)
+        # a shared timeline stores the timestamps once and each leg's Stat becomes a view onto it
+        self.timeline: timeline.Timeline = None
+        if shared_timeline and history:
+            assert(record_policy == mm_enums.RecordPolicy.ALL)
+            self.timeline = timeline.Timeline(length, self.instruments, rolling)
+            self.spot_position.stat = self.timeline.stats[0]
+            self.future_position.stat = self.timeline.stats[1]
         self.requote: bool = True
+        self.incremental: bool = incremental
         self.wait_step = 0
 
 
     def on_cancel(self, order: order.Order):
         pass
+
+
+    def on_cancel_batch(self, batch: order.OrderBatch, indices):
+        pass
     
     
     def on_exchange_init(self, exchange: exchange.Exchange, data_frequency: float):
@@ -46,29 +66,61 @@ class MultiMMStrategy(exchange.BaseStrategy):
         self.requote = True
     
     
+    def next_tick(self, counter: int) -> int:
+        if counter <= 0 or self.requote:
+            return counter
+        return counter + max(300 - self.wait_step, 0)
+
+
+    def on_skip(self, block: record.RecordBlock):
+        # skipped ticks are the ones on which on_tick would only have counted towards the requote timer
+        self.wait_step += len(block)
+        if self.timeline is None:
+            self.spot_position.record_block(block)
+            self.future_position.record_block(block)
+        else:
+            for piece in self.timeline.blocks(block):
+                self.spot_position.record_block(piece)
+                self.future_position.record_block(piece)
+
+
+    def make_quotes(self, record: record.Record) -> Tuple[order.OrderBatch, order.OrderBatch]:
+        self.quoter.future_q = self.future_position.total_qty / (self.future_position.initial_balance * self.max_leverage) 
+        self.quoter.spot_q = self.spot_position.total_qty / (self.spot_position.initial_balance * self.max_leverage) 
+        self.quoter.tau = (record.counter * self.data_frequency)
+        if self.wrap_horizon:
+            self.quoter.tau %= (self.total_time * 1000)
+        self.quoter.tau /= (self.total_time * 1000)
+        self.quoter.tau = 1 - self.quoter.tau
+
+        return self.quoter.quote(record.timestamp, self, 
+                                 record.get_mid(self.spot_instr), 
+                                 record.get_mid(self.future_instr))
+
+
     def on_tick(self, record: record.Record):
         if record is not None:
             if record.counter > 0:
                 if self.requote:
-                    self.exchange.cancel_all(record.timestamp, self.name)
+                    # incremental mode leaves the ladder resting and lets the next requote diff it
+                    if not self.incremental:
+                        self.exchange.cancel_all(record.timestamp, self.name)
                     self.requote = False
                     self.wait_step = 0
                 elif self.wait_step == 300:
                     self.wait_step = 0
-                    self.quoter.future_q = self.future_position.total_qty / (self.future_position.initial_balance * self.max_leverage) 
-                    self.quoter.spot_q = self.spot_position.total_qty / (self.spot_position.initial_balance * self.max_leverage) 
-                    self.quoter.tau = (record.counter * self.data_frequency) 
-                    self.quoter.tau /= (self.total_time * 1000)
-                    self.quoter.tau = 1 - self.quoter.tau
-
-                    (spot_bids, spot_asks, future_bids, future_asks) = self.quoter.quote(record.timestamp, self, 
-                                                                                        record.get_instrument_data(self.spot_instr, "mid"), 
-                                                                                        record.get_instrument_data(self.future_instr, "mid"))
-                    self.exchange.add_quotes(spot_bids, spot_asks)
-                    self.exchange.add_quotes(future_bids, future_asks)
+                    (spot_batch, future_batch) = self.make_quotes(record)
+                    if self.incremental:
+                        self.exchange.requote_batch(record.timestamp, spot_batch)
+                        self.exchange.requote_batch(record.timestamp, future_batch)
+                    else:
+                        self.exchange.add_batch(spot_batch)
+                        self.exchange.add_batch(future_batch)
                     self.requote = False
                 else:
                     self.wait_step += 1
             
+            if self.timeline is not None:
+                self.timeline.advance(record.timestamp, record.counter)
             self.spot_position.record(record)
             self.future_position.record(record)
@@ -0,0 +1,201 @@
+import collections
+import math
+import numpy as np
+import pandas as pd
+from typing import Deque, Tuple
+from mmtester import base_instrument, data
+
+
+class RunningMoments:
+    def __init__(self):
+        self.count: int = 0
+        self.mean: float = 0.0
+        self.m2: float = 0.0
+
+
+    def add(self, x: float) -> None:
+        # Welford's update
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (x - self.mean)
+
+
+    def moments(self, x: float=None) -> Tuple[int, float, float]:
+        # (count, mean, sample std), optionally as if x had been added
+        count, mean, m2 = self.count, self.mean, self.m2
+        if x is not None:
+            count += 1
+            delta = x - mean
+            mean += delta / count
+            m2 += delta * (x - mean)
+        std = math.sqrt(m2 / (count - 1)) if count > 1 else float("nan")
+        return count, mean if count > 0 else float("nan"), std
+
+
+class OnlineStat:
+    def __init__(self, instrument: base_instrument.BaseInstrument, resample: str='5min', interval: str='15Min',
+                 trading_days: int=365):
+        self.instrument: base_instrument.BaseInstrument = instrument
+        self.width: int = pd.Timedelta(resample).value
+        self.window: int = pd.Timedelta(interval).value
+        self.trading_days: int = trading_days
+        self.reset()
+
+
+    def reset(self) -> None:
+        self.curr_record: int = 0
+        self.first_timestamp: int = None
+        self.last_timestamp: int = None
+        self.first_equity: float = None
+        self.last_equity: float = None
+        self.first_balance: float = None
+        self.last_balance: float = None
+        self.first_fee: float = None
+        self.last_fee: float = None
+
+        # buckets are counted from midnight of the first day, like DataFrame.resample
+        self.origin: int = None
+        self.bucket: int = None
+        self.closed_bucket: int = None
+        self.closed_equity: float = None
+        self.pnl: RunningMoments = RunningMoments()
+        self.downside: RunningMoments = RunningMoments()
+        self.peak: float = -np.inf
+        self.trough: float = np.inf
+
+        # trade counters only change on fills, so the window base is found from the change points alone
+        self.changes: Deque[Tuple[int, int, float]] = collections.deque()
+        self.trade_num_sum: float = 0.0
+        self.trade_qty_sum: float = 0.0
+        self.window_count: int = 0
+
+
+    def close_bucket(self) -> None:
+        if self.closed_bucket is not None and self.bucket == self.closed_bucket + 1:
+            pnl = self.last_equity - self.closed_equity
+            self.pnl.add(pnl)
+            if pnl < 0:
+                self.downside.add(pnl)
+        self.peak = max(self.peak, self.last_equity)
+        self.trough = min(self.trough, self.last_equity - self.peak)
+        self.closed_bucket = self.bucket
+        self.closed_equity = self.last_equity
+
+
+    def window_base(self, timestamp: int) -> Tuple[int, float]:
+        # counters at the last record at or before the window start, else at the first record
+        cutoff = timestamp - self.window
+        while len(self.changes) > 1 and self.changes[1][0] <= cutoff:
+            self.changes.popleft()
+        return self.changes[0][1], self.changes[0][2]
+
+
+    def record(self, timestamp: int, mid: float, balance: float, position: float,
+               avg_price: float, fee: float, trade_num: int, trade_qty: float) -> None:
+        equity = self.instrument.equity(mid, balance, position, avg_price, fee)
+        if self.curr_record == 0:
+            self.first_timestamp = timestamp
+            self.first_equity = equity
+            self.first_balance = balance
+            self.first_fee = fee
+            self.origin = data.day_origin(timestamp)
+
+        bucket = (timestamp - self.origin) // self.width
+        if self.bucket is not None and bucket != self.bucket:
+            self.close_bucket()
+        self.bucket = bucket
+
+        if not self.changes or self.changes[-1][1] != trade_num or self.changes[-1][2] != trade_qty:
+            self.changes.append((timestamp, trade_num, trade_qty))
+        if self.curr_record > 0:
+            base_num, base_qty = self.window_base(timestamp)
+            self.trade_num_sum += trade_num - base_num
+            self.trade_qty_sum += trade_qty - base_qty
+            self.window_count += 1
+
+        self.last_timestamp = timestamp
+        self.last_equity = equity
+        self.last_balance = balance
+        self.last_fee = fee
+        self.curr_record += 1
+
+
+    def record_block(self, timestamps: np.ndarray, mids: np.ndarray, balance: float, position: float,
+                     avg_price: float, fee: float, trade_num: int, trade_qty: float) -> None:
+        # a run of ticks with only the mid moving: one record for the first tick, then per-bucket closes
+        if len(timestamps) == 0:
+            return
+        self.record(timestamps.item(0), mids[0], balance, position, avg_price, fee, trade_num, trade_qty)
+        timestamps = timestamps[1:]
+        if len(timestamps) == 0:
+            return
+
+        equity = self.instrument.equity(mids[1:], balance, position, avg_price, fee)
+        buckets = (timestamps - self.origin) // self.width
+        for start in np.r_[0, np.flatnonzero(np.diff(buckets)) + 1]:
+            if buckets[start] != self.bucket:
+                if start > 0:
+                    self.last_equity = equity[start - 1]
+                self.close_bucket()
+                self.bucket = int(buckets[start])
+        self.last_equity = equity[-1]
+
+        cutoffs = timestamps - self.window
+        times = np.array([change[0] for change in self.changes], dtype=np.int64)
+        base = np.maximum(np.searchsorted(times, cutoffs, side="right") - 1, 0)
+        nums = np.array([change[1] for change in self.changes], dtype=np.float64)
+        qtys = np.array([change[2] for change in self.changes], dtype=np.float64)
+        self.trade_num_sum += float(np.sum(trade_num - nums[base]))
+        self.trade_qty_sum += float(np.sum(trade_qty - qtys[base]))
+        self.window_count += len(timestamps)
+        self.window_base(timestamps.item(-1))
+
+        self.last_timestamp = timestamps.item(-1)
+        self.curr_record += len(timestamps)
+
+
+    def open_pnl(self) -> float:
+        # the open bucket counts as closed at its latest equity, as in a resample of the history so far
+        if self.closed_bucket is not None and self.bucket == self.closed_bucket + 1:
+            return self.last_equity - self.closed_equity
+        return None
+
+
+    def annualisation(self) -> float:
+        return np.sqrt((24 * 3600) / (self.width / 1e9) * self.trading_days)
+
+
+    def sharpe(self) -> float:
+        _, mean, std = self.pnl.moments(self.open_pnl())
+        return mean / std * self.annualisation()
+
+
+    def sortino(self) -> float:
+        pnl = self.open_pnl()
+        _, mean, _ = self.pnl.moments(pnl)
+        _, _, std = self.downside.moments(pnl if pnl is not None and pnl < 0 else None)
+        return mean / std * self.annualisation()
+
+
+    def maxdrawdown(self) -> float:
+        peak = max(self.peak, self.last_equity)
+        return -min(self.trough, self.last_equity - peak)
+
+
+    def trade_num_frequency(self) -> float:
+        return self.trade_num_sum / self.window_count if self.window_count > 0 else float("nan")
+
+
+    def trade_volume_frequency(self) -> float:
+        return self.trade_qty_sum / self.window_count if self.window_count > 0 else float("nan")
+
+
+    def summary(self, filename=None):
+        # same fields as Stat.summary, available at any step
+        capital = self.first_balance
+        backtest_days = (self.last_timestamp - self.first_timestamp) / 1e9 / (24 * 3600)
+        ar = self.last_equity - self.first_equity
+        return (backtest_days, self.last_balance, self.sharpe(), self.sortino(), ar / capital * 100,
+                self.last_fee - self.first_fee, self.maxdrawdown() / capital * 100,
+                self.trade_num_frequency(), self.trade_volume_frequency())
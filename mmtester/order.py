@@ -1,15 +1,169 @@
-import pandas as pd
+import numpy as np
+from typing import List
 from mmtester import mm_enums, base_instrument
 
 
 class Order:
-    def __init__(self, timestamp: pd.DatetimeIndex, strategy_name: str, 
-                 instrument: base_instrument.BaseInstrument,  side: mm_enums.Side, 
+    __slots__ = ("timestamp", "strategy_name", "instrument", "side", "price", "quantity", "state", "batch", "index")
+
+    def __init__(self, timestamp: int, strategy_name: str,
+                 instrument: base_instrument.BaseInstrument,  side: mm_enums.Side,
                  price: float, quantity:float):
-        self.timestamp: pd.DatetimeIndex = timestamp
+        self.timestamp: int = timestamp
         self.strategy_name: str = strategy_name
         self.instrument: base_instrument.BaseInstrument = instrument
         self.side = side
         self.price: float = price
         self.quantity: float = quantity
-        self.state: mm_enums.OrderState = mm_enums.OrderState.NEW
\ No newline at end of file
+        self.state: mm_enums.OrderState = mm_enums.OrderState.NEW
+        # the exchange tracks every order as a slot of an OrderBatch
+        self.batch: OrderBatch = None
+        self.index: int = 0
+
+
+class OrderPool:
+    __slots__ = ("free",)
+
+    def __init__(self):
+        self.free: List[Order] = []
+
+
+    def __len__(self) -> int:
+        return len(self.free)
+
+
+    def acquire(self, timestamp: int, strategy_name: str, instrument: base_instrument.BaseInstrument,
+                side: mm_enums.Side, price: float, quantity: float) -> Order:
+        if not self.free:
+            return Order(timestamp, strategy_name, instrument, side, price, quantity)
+        o = self.free.pop()
+        o.__init__(timestamp, strategy_name, instrument, side, price, quantity)
+        return o
+
+
+    def release(self, order: Order) -> None:
+        order.batch = None
+        self.free.append(order)
+
+
+class OrderBatch:
+    __slots__ = ("timestamp", "strategy_name", "instrument", "sides", "prices", "quantities", "levels", "states",
+                 "active", "cancel_time", "open", "first_id", "orders", "pool")
+
+    def __init__(self, timestamp: int, strategy_name: str, instrument: base_instrument.BaseInstrument,
+                 sides: np.ndarray, prices: np.ndarray, quantities: np.ndarray):
+        self.timestamp: int = timestamp
+        self.strategy_name: str = strategy_name
+        self.instrument: base_instrument.BaseInstrument = instrument
+        self.sides: np.ndarray = np.array(sides, dtype=np.int8)
+        self.prices: np.ndarray = np.array(prices, dtype=np.float64)
+        self.quantities: np.ndarray = np.array(quantities, dtype=np.float64)
+        assert(len(self.sides) == len(self.prices) == len(self.quantities))
+        # position of each order within its side of the ladder, counted from the touch
+        buy = self.is_buy()
+        self.levels: np.ndarray = np.empty(len(self.prices), dtype=np.int64)
+        self.levels[buy] = np.arange(np.count_nonzero(buy))
+        self.levels[~buy] = np.arange(np.count_nonzero(~buy))
+        self.states: np.ndarray = np.full(len(self.prices), mm_enums.OrderState.NEW.value, dtype=np.int8)
+        self.active: np.ndarray = np.zeros(len(self.prices), dtype=bool)
+        # when the latest cancel request takes effect, -1 while none is in flight
+        self.cancel_time: np.ndarray = np.full(len(self.prices), -1, dtype=np.int64)
+        self.open: int = len(self.prices)
+        self.first_id: int = None
+        # Order objects are only created for slots a caller asks for
+        self.orders: List[Order] = [None] * len(self.prices)
+        self.pool: OrderPool = None
+
+
+    @classmethod
+    def from_orders(cls, orders: List[Order]) -> 'OrderBatch':
+        first = orders[0]
+        for o in orders:
+            assert(o.strategy_name == first.strategy_name and o.instrument == first.instrument)
+            assert(o.timestamp == first.timestamp)
+        batch = cls(first.timestamp, first.strategy_name, first.instrument,
+                    [o.side.value for o in orders], [o.price for o in orders], [o.quantity for o in orders])
+        for i, o in enumerate(orders):
+            batch.states[i] = o.state.value
+            batch.attach(i, o)
+        return batch
+
+
+    def __len__(self) -> int:
+        return len(self.prices)
+
+
+    def attach(self, i: int, order: Order) -> None:
+        order.batch = self
+        order.index = i
+        self.orders[i] = order
+
+
+    def is_buy(self) -> np.ndarray:
+        return self.sides == mm_enums.Side.BUY.value
+
+
+    def side(self, i: int) -> mm_enums.Side:
+        return mm_enums.Side(int(self.sides[i]))
+
+
+    def state(self, i: int) -> mm_enums.OrderState:
+        return mm_enums.OrderState(int(self.states[i]))
+
+
+    def get_order(self, i: int) -> Order:
+        o = self.orders[i]
+        if o is None:
+            if self.pool is None:
+                o = Order(self.timestamp, self.strategy_name, self.instrument, self.side(i),
+                          self.prices[i], self.quantities[i])
+            else:
+                o = self.pool.acquire(self.timestamp, self.strategy_name, self.instrument, self.side(i),
+                                      self.prices[i], self.quantities[i])
+            o.state = self.state(i)
+            self.attach(i, o)
+        return o
+
+
+    def recycle(self, i: int) -> None:
+        # hands the materialized order back to the pool once its callback has returned
+        if self.pool is not None and self.orders[i] is not None:
+            self.pool.release(self.orders[i])
+            self.orders[i] = None
+
+
+    def open_indices(self) -> np.ndarray:
+        return np.flatnonzero(self.states == mm_enums.OrderState.NEW.value)
+
+
+    def set_state(self, indices: np.ndarray, state: mm_enums.OrderState) -> None:
+        self.states[indices] = state.value
+        for i in np.atleast_1d(indices):
+            if self.orders[i] is not None:
+                self.orders[i].state = state
+
+
+    def set_prices(self, prices: np.ndarray) -> None:
+        self.prices = prices
+        for i, o in enumerate(self.orders):
+            if o is not None:
+                o.price = self.prices[i]
+
+
+    def set_quantities(self, indices: np.ndarray, quantities: np.ndarray) -> None:
+        self.quantities[indices] = quantities
+        for i in np.atleast_1d(indices):
+            if self.orders[i] is not None:
+                self.orders[i].quantity = self.quantities[i]
+
+
+    def subset(self, mask: np.ndarray) -> 'OrderBatch':
+        assert(self.first_id is None)
+        batch = OrderBatch(self.timestamp, self.strategy_name, self.instrument,
+                           self.sides[mask], self.prices[mask], self.quantities[mask])
+        batch.states = self.states[mask]
+        batch.levels = self.levels[mask]
+        for i, j in enumerate(np.flatnonzero(mask)):
+            if self.orders[j] is not None:
+                batch.attach(i, self.orders[j])
+        return batch
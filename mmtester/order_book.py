@@ -0,0 +1,93 @@
+import bisect
+from typing import Dict, List, Tuple
+from mmtester import mm_enums, order, base_instrument
+
+
+class BookSide:
+    def __init__(self, side: mm_enums.Side):
+        self.side: mm_enums.Side = side
+        # bids are keyed by -price so both sides keep their most aggressive level first
+        self.sign: float = -1.0 if side == mm_enums.Side.BUY else 1.0
+        self.keys: List[float] = []
+        self.levels: Dict[float, Dict[int, None]] = {}
+
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+
+    def add(self, price: float, order_id: int) -> None:
+        key = self.sign * price
+        level = self.levels.get(key)
+        if level is None:
+            level = self.levels[key] = {}
+            bisect.insort(self.keys, key)
+        level[order_id] = None
+
+
+    def remove(self, price: float, order_id: int) -> bool:
+        key = self.sign * price
+        level = self.levels.get(key)
+        if level is None or order_id not in level:
+            return False
+
+        del level[order_id]
+        if not level:
+            del self.levels[key]
+            del self.keys[bisect.bisect_left(self.keys, key)]
+        return True
+
+
+    def best_price(self) -> float:
+        if not self.keys:
+            return None
+        return self.sign * self.keys[0]
+
+
+    def crossing(self, price: float) -> List[int]:
+        # a bid crosses when its price >= ask and an ask when its price <= bid, i.e. key <= sign * price
+        limit = self.sign * price
+        crossed = []
+        for key in self.keys:
+            if key > limit:
+                break
+            crossed.extend(self.levels[key])
+        return crossed
+
+
+class OrderBook:
+    def __init__(self):
+        self.sides: Dict[Tuple[base_instrument.BaseInstrument, mm_enums.Side], BookSide] = {}
+        # levels hold order ids; the owning batch resolves an id to its slot
+        self.owners: Dict[int, order.OrderBatch] = {}
+
+
+    def __len__(self) -> int:
+        return len(self.owners)
+
+
+    def get_side(self, instrument: base_instrument.BaseInstrument, side: mm_enums.Side) -> BookSide:
+        book_side = self.sides.get((instrument, side))
+        if book_side is None:
+            book_side = self.sides[(instrument, side)] = BookSide(side)
+        return book_side
+
+
+    def add(self, batch: order.OrderBatch, i: int) -> None:
+        order_id = batch.first_id + i
+        self.get_side(batch.instrument, batch.side(i)).add(batch.prices.item(i), order_id)
+        self.owners[order_id] = batch
+
+
+    def remove(self, batch: order.OrderBatch, i: int) -> bool:
+        order_id = batch.first_id + i
+        book_side = self.sides.get((batch.instrument, batch.side(i)))
+        if book_side is None or not book_side.remove(batch.prices.item(i), order_id):
+            return False
+        del self.owners[order_id]
+        return True
+
+
+    def resolve(self, order_id: int) -> Tuple[order.OrderBatch, int]:
+        batch = self.owners[order_id]
+        return batch, order_id - batch.first_id
@@ -1,10 +1,15 @@
 import numpy as np
-from mmtester import mm_enums, stat, base_instrument, order, record
+from mmtester import mm_enums, stat, online_stat, base_instrument, order, record
 
 
 class Position:
+    __slots__ = ("initial_balance", "balance", "instrument", "total_qty", "fees", "trade_num", "trade_qty",
+                 "avg_price", "stat", "online")
+
     def __init__(self, balance: float, instrument: base_instrument.BaseInstrument,
-                 init_qty: float, init_avg_price: float, length: int):
+                 init_qty: float, init_avg_price: float, length: int, rolling: bool=False,
+                 online: bool=False, history: bool=True,
+                 policy: mm_enums.RecordPolicy=mm_enums.RecordPolicy.ALL, interval: int=1):
         self.initial_balance: float = balance
         self.balance: float = balance
         self.instrument: base_instrument.BaseInstrument = instrument
@@ -13,7 +18,9 @@ class Position:
         self.trade_num: int = 0
         self.trade_qty: float = 0
         self.avg_price: float = init_avg_price
-        self.stat = stat.Stat(length, instrument)
+        # history keeps the per-tick Stat arrays; online keeps constant-memory running metrics
+        self.stat = stat.Stat(length, instrument, rolling=rolling, policy=policy, interval=interval) if history else None
+        self.online = online_stat.OnlineStat(instrument) if online else None
     
     
     def on_fill(self, order:order.Order, fill_type: mm_enums.FillType) -> None:
@@ -44,8 +51,20 @@ class Position:
         self.balance += pnl
         
     
+    def record_block(self, block: record.RecordBlock) -> None:
+        mids = block.get_mid(self.instrument)
+        if self.stat is not None:
+            self.stat.record_block(block.timestamps, mids, self.balance, self.total_qty, self.avg_price,
+                                   self.fees, self.trade_num, self.trade_qty, block.counter)
+        if self.online is not None:
+            self.online.record_block(block.timestamps, mids, self.balance, self.total_qty, self.avg_price,
+                                     self.fees, self.trade_num, self.trade_qty)
+        
+        
     def record(self, record: record.Record) -> None:
-        price = record.get_instrument_data(self.instrument, "mid")
-        self.stat.record(record.timestamp, price, self.balance, self.total_qty, self.avg_price, self.fees, self.trade_num, self.trade_qty)
+        price = record.get_mid(self.instrument)
+        if self.stat is not None:
+            self.stat.record(record.timestamp, price, self.balance, self.total_qty, self.avg_price, self.fees, self.trade_num, self.trade_qty, record.counter)
+        if self.online is not None:
+            self.online.record(record.timestamp, price, self.balance, self.total_qty, self.avg_price, self.fees, self.trade_num, self.trade_qty)
     
-    
\ No newline at end of file
@@ -1,22 +1,105 @@
+import numpy as np
 import pandas as pd
 from mmtester import base_instrument
 
 class Record:
-    def __init__(self, counter: int, timestamp: pd.DatetimeIndex, series: pd.Series):
+    __slots__ = ("counter", "timestamp", "series")
+
+    def __init__(self, counter: int, timestamp: int, series: pd.Series):
         self.counter: int = counter
-        self.timestamp: pd.DatetimeIndex = timestamp
+        self.timestamp: int = timestamp
         self.series: pd.Series = series
-    
-    
+
+
+    def get_datetime(self) -> pd.Timestamp:
+        return pd.Timestamp(self.timestamp, unit="ns")
+
+
     def get_instrument_data(self, instrument: base_instrument.BaseInstrument, key: str) -> any:
         lookup = instrument.name + "_" + key
         return self.series[lookup]
-    
-    
+
+
+    def get_bid(self, instrument: base_instrument.BaseInstrument) -> float:
+        return self.series[instrument.name + "_bid"]
+
+
+    def get_ask(self, instrument: base_instrument.BaseInstrument) -> float:
+        return self.series[instrument.name + "_ask"]
+
+
+    def get_mid(self, instrument: base_instrument.BaseInstrument) -> float:
+        return self.series[instrument.name + "_mid"]
+
+
     def get(self, key: str) -> any:
         return self.series[key]
-    
-    
+
+
+    def get_features(self) -> np.ndarray:
+        return self.series[[key for key in self.series.index if "feat_" in key]].to_numpy()
+
+
     def get_all(self) -> pd.Series:
         return self.series
-    
+
+
+class ArrayRecord(Record):
+    __slots__ = ("data", "values", "row")
+
+    def __init__(self, counter: int, timestamp: int, data: any, row: int):
+        self.counter: int = counter
+        self.timestamp: int = timestamp
+        self.data = data
+        self.values: np.ndarray = data.values
+        self.row: int = row
+
+
+    def get_instrument_data(self, instrument: base_instrument.BaseInstrument, key: str) -> any:
+        return self.values[self.row, self.data.column_index[instrument.name + "_" + key]]
+
+
+    def get_bid(self, instrument: base_instrument.BaseInstrument) -> float:
+        return self.values[self.row, instrument.bid_col]
+
+
+    def get_ask(self, instrument: base_instrument.BaseInstrument) -> float:
+        return self.values[self.row, instrument.ask_col]
+
+
+    def get_mid(self, instrument: base_instrument.BaseInstrument) -> float:
+        return self.values[self.row, instrument.mid_col]
+
+
+    def get(self, key: str) -> any:
+        return self.values[self.row, self.data.column_index[key]]
+
+
+    def get_features(self) -> np.ndarray:
+        return self.values[self.row, self.data.feature_cols]
+
+
+    def get_all(self) -> pd.Series:
+        return pd.Series(self.values[self.row, :], index=self.data.columns, name=self.get_datetime())
+
+
+class RecordBlock:
+    __slots__ = ("counter", "timestamps", "data", "row")
+
+    def __init__(self, counter: int, timestamps: np.ndarray, data: any, row: int):
+        self.counter: int = counter
+        self.timestamps: np.ndarray = timestamps
+        self.data = data
+        self.row: int = row
+
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+
+    def slice(self, start: int, stop: int) -> 'RecordBlock':
+        return RecordBlock(self.counter + start, self.timestamps[start:stop], self.data, self.row + start)
+
+
+    def get_mid(self, instrument: base_instrument.BaseInstrument) -> np.ndarray:
+        return self.data.values[self.row:self.row + len(self.timestamps), instrument.mid_col]
@@ -0,0 +1,33 @@
+import heapq
+import itertools
+from typing import Iterator, List, Tuple
+from mmtester import mm_enums
+
+
+class EventScheduler:
+    def __init__(self):
+        self.events: List[Tuple[any, int, mm_enums.EventType, any]] = []
+        # ties on activation time are released in submission order
+        self.sequence: Iterator[int] = itertools.count()
+
+
+    def __len__(self) -> int:
+        return len(self.events)
+
+
+    def schedule(self, due: any, kind: mm_enums.EventType, payload: any) -> None:
+        heapq.heappush(self.events, (due, next(self.sequence), kind, payload))
+
+
+    def next_due(self) -> any:
+        if not self.events:
+            return None
+        return self.events[0][0]
+
+
+    def pop_due(self, now: any) -> List[Tuple[mm_enums.EventType, any]]:
+        due = []
+        while self.events and self.events[0][0] <= now:
+            _, _, kind, payload = heapq.heappop(self.events)
+            due.append((kind, payload))
+        return due
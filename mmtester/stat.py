@@ -1,79 +1,244 @@
 from matplotlib import pyplot as plt
 import pandas as pd
 import numpy as np
-from typing import List
-from datetime import datetime
-from mmtester import base_instrument
+from typing import Dict, Tuple
+from mmtester import base_instrument, data, mm_enums
+
+FIELDS = {"timestamp": np.int64, "mid": np.float64, "balance": np.float64, "position": np.float64,
+          "avg_price": np.float64, "fee": np.float64, "trade_num": np.int64, "trade_qty": np.float64,
+          "tick": np.int64, "row": np.int64}
+STATE = ["balance", "position", "avg_price", "fee", "trade_num", "trade_qty"]
+INITIAL_CAPACITY = 4096
+
 
 class Stat:
-    def __init__(self, length: int, instrument: base_instrument.BaseInstrument, unit='ms'):
+    def __init__(self, length: int, instrument: base_instrument.BaseInstrument, unit='ms', rolling: bool=False,
+                 policy: mm_enums.RecordPolicy=mm_enums.RecordPolicy.ALL, interval: int=1, bucket: str='5min'):
         self.instrument: base_instrument.BaseInstrument = instrument
         self.unit: str = unit
+        # length=None grows the arrays geometrically instead of preallocating a fixed window
         self.length = length
-        self.timestamp: List[pd.DatetimeIndex] = [None] * length
-        self.mid: List[float] = [None] * length
-        self.balance: List[float] = [None] * length
-        self.position: List[float] = [None] * length
-        self.avg_price: List[float] = [None] * length
-        self.fee: List[float] = [None] * length
-        self.trade_num: List[int] = [None] * length
-        self.trade_qty: List[float] = [None] * length
+        self.rolling: bool = rolling
+        assert(not (rolling and length is None))
+        # policy decides which ticks are stored; expand rebuilds the others from the data
+        self.policy: mm_enums.RecordPolicy = policy
+        self.interval: int = interval
+        self.width: int = pd.Timedelta(bucket).value
+        assert(interval > 0)
+        self.reset()
+
+
+    def reset(self) -> None:
+        capacity = INITIAL_CAPACITY if self.length is None else self.length
+        for name, dtype in FIELDS.items():
+            setattr(self, name, np.zeros(capacity, dtype=dtype))
         self.curr_record = 0
+        self.ticks = 0
+        self.origin: int = None
+        # the latest tick when the policy did not store it, flushed by close
+        self.pending: tuple = None
+        self.cache: Dict = {}
+        self.cache_stamp: Tuple[int, int] = None
+
+
+    def reserve(self, count: int) -> int:
+        # makes room for up to count more records and returns how many fit
+        capacity = len(self.timestamp)
+        if self.curr_record == capacity:
+            if self.rolling:
+                self.roll()
+            elif self.length is None:
+                self.grow(max(2 * capacity, self.curr_record + count))
+        return min(count, len(self.timestamp) - self.curr_record)
+
+
+    def grow(self, capacity: int) -> None:
+        for name, dtype in FIELDS.items():
+            values = np.zeros(capacity, dtype=dtype)
+            values[:self.curr_record] = getattr(self, name)[:self.curr_record]
+            setattr(self, name, values)
+
+
+    def keep(self, values: tuple) -> bool:
+        # whether the policy stores this tick; values is laid out like the arguments of store
+        timestamp = values[0]
+        if self.ticks == 0:
+            self.origin = data.day_origin(timestamp)
+            return True
+        if self.policy == mm_enums.RecordPolicy.BUCKET:
+            # the last tick of a bucket is only known once the next bucket starts
+            if self.pending is not None and \
+                    (self.pending[0] - self.origin) // self.width != (timestamp - self.origin) // self.width:
+                self.store(*self.pending)
+                self.pending = None
+        # every policy stores the ticks where the position state changed, so expand can carry it forward exactly
+        i = self.curr_record - 1
+        changed = values[2:8] != (self.balance[i], self.position[i], self.avg_price[i],
+                                  self.fee[i], self.trade_num[i], self.trade_qty[i])
+        if self.policy == mm_enums.RecordPolicy.INTERVAL:
+            return changed or self.ticks % self.interval == 0
+        if self.policy in (mm_enums.RecordPolicy.BUCKET, mm_enums.RecordPolicy.CHANGE):
+            return changed
+        return True
+
+
+    def record(self, timestamp: int, mid: float, balance: float, position: float, 
+               avg_price: float, fee: float, trade_num: int, trade_qty: float, row: int=-1) -> None:
+        if self.policy != mm_enums.RecordPolicy.ALL:
+            values = (timestamp, mid, balance, position, avg_price, fee, trade_num, trade_qty, self.ticks, row)
+            if not self.keep(values):
+                self.pending = values
+                self.ticks += 1
+                return
+            self.pending = None
+        self.store(timestamp, mid, balance, position, avg_price, fee, trade_num, trade_qty, self.ticks, row)
+        self.ticks += 1
+
+
+    def store(self, timestamp: int, mid: float, balance: float, position: float,
+              avg_price: float, fee: float, trade_num: int, trade_qty: float, tick: int, row: int) -> None:
+        if self.reserve(1) <= 0:
+            raise IndexError("stat capacity exceeded")
+        i = self.curr_record
+        self.timestamp[i] = timestamp
+        self.mid[i] = mid
+        self.balance[i] = balance
+        self.position[i] = position
+        self.avg_price[i] = avg_price
+        self.fee[i] = fee
+        self.trade_num[i] = trade_num
+        self.trade_qty[i] = trade_qty
+        self.tick[i] = tick
+        self.row[i] = row
+        self.curr_record += 1
 
 
-    def record(self, timestamp: pd.DatetimeIndex, mid: float, balance: float, position: float, 
-               avg_price: float, fee: float, trade_num: int, trade_qty: float) -> None:
-        self.timestamp[self.curr_record] = timestamp
-        self.mid[self.curr_record] = mid
-        self.balance[self.curr_record] = balance
-        self.position[self.curr_record] = position
-        self.avg_price[self.curr_record] = avg_price
-        self.fee[self.curr_record] = fee
-        self.trade_num[self.curr_record] = trade_num
-        self.trade_qty[self.curr_record] = trade_qty
-        self.curr_record += 1
+    def record_block(self, timestamps: np.ndarray, mids: np.ndarray, balance: float, position: float,
+                     avg_price: float, fee: float, trade_num: int, trade_qty: float, row: int=-1) -> None:
+        # bulk fill for a run of ticks over which only the mid moved
+        count = len(timestamps)
+        if count == 0:
+            return
+        ticks = np.arange(self.ticks, self.ticks + count)
+        rows = np.arange(row, row + count) if row >= 0 else np.full(count, -1)
+        if self.policy != mm_enums.RecordPolicy.ALL:
+            keep = np.zeros(count, dtype=bool)
+            keep[0] = self.keep((timestamps.item(0), mids[0], balance, position, avg_price, fee,
+                                 trade_num, trade_qty, self.ticks, rows.item(0)))
+            if self.policy == mm_enums.RecordPolicy.INTERVAL:
+                keep[1:] = ticks[1:] % self.interval == 0
+            elif self.policy == mm_enums.RecordPolicy.BUCKET:
+                buckets = (timestamps - self.origin) // self.width
+                keep[:-1] |= buckets[:-1] != buckets[1:]
+            self.pending = None if keep[-1] else (timestamps.item(-1), mids[-1], balance, position, avg_price, fee,
+                                                  trade_num, trade_qty, ticks.item(-1), rows.item(-1))
+            timestamps, mids, ticks, rows = timestamps[keep], mids[keep], ticks[keep], rows[keep]
+        self.ticks += count
+        self.store_block(timestamps, mids, balance, position, avg_price, fee, trade_num, trade_qty, ticks, rows)
+
+
+    def store_block(self, timestamps: np.ndarray, mids: np.ndarray, balance: float, position: float,
+                    avg_price: float, fee: float, trade_num: int, trade_qty: float,
+                    ticks: np.ndarray, rows: np.ndarray) -> None:
+        start = 0
+        while start < len(timestamps):
+            count = self.reserve(len(timestamps) - start)
+            if count <= 0:
+                raise IndexError("stat capacity exceeded")
+
+            begin = self.curr_record
+            end = begin + count
+            self.timestamp[begin:end] = timestamps[start:start + count]
+            self.mid[begin:end] = mids[start:start + count]
+            self.balance[begin:end] = balance
+            self.position[begin:end] = position
+            self.avg_price[begin:end] = avg_price
+            self.fee[begin:end] = fee
+            self.trade_num[begin:end] = trade_num
+            self.trade_qty[begin:end] = trade_qty
+            self.tick[begin:end] = ticks[start:start + count]
+            self.row[begin:end] = rows[start:start + count]
+            self.curr_record = end
+            start += count
+
+
+    def roll(self) -> None:
+        # keep the most recent half of the window so a rolling stat never grows past length
+        keep = self.length // 2
+        drop = self.curr_record - keep
+        for name in FIELDS:
+            values = getattr(self, name)
+            values[:keep] = values[drop:self.curr_record]
+        self.curr_record = keep
+
 
     def close(self):
-        self.timestamp = self.timestamp[:self.curr_record]
-        self.mid = self.mid[:self.curr_record]
-        self.balance = self.balance[:self.curr_record]
-        self.position = self.position[:self.curr_record]
-        self.avg_price = self.avg_price[:self.curr_record]
-        self.fee = self.fee[:self.curr_record]
-        self.trade_num = self.trade_num[:self.curr_record]
-        self.trade_qty = self.trade_qty[:self.curr_record]
-
-    def datetime(self) -> datetime:
-        return np.asarray(self.timestamp)
-
-
-    def equity(self, resample: str=None, include_fee: bool=True) -> float:
-        if include_fee:
-            equity = pd.Series(
-                self.instrument.equity(
-                    np.asarray(self.mid),
-                    np.asarray(self.balance),
-                    np.asarray(self.position),
-                    np.asarray(self.avg_price),
-                    np.asarray(self.fee)
-                ),
-                index=self.datetime()
-            )
-        else:
-            equity = pd.Series(
-                self.instrument.equity(
-                    np.asarray(self.mid),
-                    np.asarray(self.balance),
-                    np.asarray(self.position),
-                    np.asarray(self.avg_price),
-                    0
-                ),
-                index=self.datetime()
-            )
-        if resample is None:
-            return equity
-        else:
-            return equity.resample(resample).last()
+        if self.pending is not None:
+            self.store(*self.pending)
+            self.pending = None
+        for name in FIELDS:
+            setattr(self, name, getattr(self, name)[:self.curr_record])
+
+
+    def expand(self, dataObject: data.Data) -> None:
+        # rebuilds every tick from the first record to the last: consecutive ticks read consecutive rows,
+        # and the position state carries forward from the last stored record. dataObject is the Data the run
+        # was fed, or its DataStream as long as the window still holds the rows from the first record on
+        self.close()
+        if self.curr_record == 0:
+            return
+        assert(self.row[0] >= 0)
+        window, offset = dataObject, 0
+        if isinstance(dataObject, data.DataStream):
+            window, offset = dataObject.window, dataObject.offset
+            if self.row.item(0) < offset or self.timestamp.item(0) < window.timestamps.item(0):
+                raise RuntimeError("rows from %d on were dropped from the stream window, expand %s against a Data "
+                                   "holding the whole run" % (self.row.item(0), self.instrument.name))
+        ticks = np.arange(self.tick[0], self.tick[-1] + 1)
+        last = np.searchsorted(self.tick, ticks, side="right") - 1
+        rows = self.row[last] + (ticks - self.tick[last])
+        lag = window.search_timestamp(self.timestamp.item(0)) + offset - self.row.item(0)
+
+        for name in STATE:
+            setattr(self, name, getattr(self, name)[last])
+        self.timestamp = window.timestamps[rows + lag - offset]
+        self.mid = window.get_column(self.instrument.name + "_mid")[rows - offset]
+        self.tick = ticks
+        self.row = rows
+        self.curr_record = len(ticks)
+        self.policy = mm_enums.RecordPolicy.ALL
+
+
+    def cached(self) -> Dict:
+        # memoized series stay valid until a tick is recorded or the stored records change
+        stamp = (self.ticks, self.curr_record)
+        if stamp != self.cache_stamp:
+            self.cache = {}
+            self.cache_stamp = stamp
+        return self.cache
+
+
+    def datetime(self) -> pd.DatetimeIndex:
+        cache = self.cached()
+        if "index" not in cache:
+            cache["index"] = data.to_datetime(self.timestamp[:self.curr_record])
+        return cache["index"]
+
+
+    def equity(self, resample: str=None, include_fee: bool=True) -> pd.Series:
+        cache = self.cached()
+        key = (include_fee, resample)
+        if key not in cache:
+            if resample is None:
+                n = self.curr_record
+                fee = self.fee[:n] if include_fee else 0
+                cache[key] = pd.Series(
+                    self.instrument.equity(self.mid[:n], self.balance[:n], self.position[:n], self.avg_price[:n], fee),
+                    index=self.datetime()
+                )
+            else:
+                cache[key] = self.equity(None, include_fee).resample(resample).last()
+        return cache[key]
 
 
     def sharpe(self, resample: str, include_fee: bool=True, trading_days=365) -> float:
@@ -109,42 +274,33 @@ class Stat:
 
 
     def trade_num_frequency(self, interval: str) -> float:
-        return pd.Series(self.trade_num, index=self.datetime()).diff().rolling(interval).sum().mean()
+        return pd.Series(self.trade_num[:self.curr_record], index=self.datetime()).diff().rolling(interval).sum().mean()
 
 
     def trade_volume_frequency(self, interval: str) -> float:
-        return pd.Series(self.trade_qty, index=self.datetime()).diff().rolling(interval).sum().mean()
+        return pd.Series(self.trade_qty[:self.curr_record], index=self.datetime()).diff().rolling(interval).sum().mean()
 
 
     def annualised_return(self, denom: float=None, include_fee=True, trading_days=365):
         equity = self.equity(None, include_fee=include_fee)
         c = (24 * 3600) / (equity.index[-1] - equity.index[0]).total_seconds()
         if denom is None:
-            return equity[-1] * c * trading_days
+            return equity.iloc[-1] * c * trading_days
         else:
-            return equity[-1] * c * trading_days / denom
+            return equity.iloc[-1] * c * trading_days / denom
         
     
-    def summary(self, filename, resample='5min', trading_days=365):
+    def summary(self, filename, resample='5min', trading_days=365, dataObject: data.Data=None):
+        if dataObject is not None:
+            self.expand(dataObject)
+        if self.policy != mm_enums.RecordPolicy.ALL:
+            raise RuntimeError("summary needs every tick; pass the dataObject the run was fed to expand the stat")
         self.close()
         dt_index = self.datetime()
-        raw_equity = self.instrument.equity(
-            np.asarray(self.mid),
-            np.asarray(self.balance),
-            np.asarray(self.position),
-            np.asarray(self.avg_price),
-            np.asarray(self.fee)
-        )
-        raw_equity_wo_fee = self.instrument.equity(
-            np.asarray(self.mid),
-            np.asarray(self.balance),
-            np.asarray(self.position),
-            np.asarray(self.avg_price),
-            0
-        )
-        equity = pd.Series(raw_equity, index=dt_index)
-        rs_equity_wo_fee = pd.Series(raw_equity_wo_fee, index=dt_index).resample(resample).last()
-        rs_equity = equity.resample(resample).last()
+        equity = self.equity(None, include_fee=True)
+        raw_equity = equity.to_numpy()
+        rs_equity_wo_fee = self.equity(resample, include_fee=False)
+        rs_equity = self.equity(resample, include_fee=True)
         rs_pnl = rs_equity.diff().dropna()
 
         c = (24 * 3600) / (rs_pnl.index[1] - rs_pnl.index[0]).total_seconds()
@@ -162,7 +318,7 @@ class Stat:
         ftq = pd.Series(self.trade_qty, index=dt_index).diff().rolling('15Min').sum().mean()
 
         capital = self.balance[0]
-        backtest_days = (self.timestamp[-1] - self.timestamp[0]).total_seconds() / (24 * 3600)
+        backtest_days = int(self.timestamp[-1] - self.timestamp[0]) / 1e9 / (24 * 3600)
         '''print('=========== Summary ===========')
         print('backtest days: %.4f' % backtest_days)
         print('Ending balance: %.2f' % self.balance[-1])
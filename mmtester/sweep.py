@@ -0,0 +1,102 @@
+import os
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+from typing import Dict, Iterator, List, Tuple
+from mmtester import base_instrument, data, dual_as_quoter, exchange, multi_mm_strategy
+
+SUMMARY_COLUMNS = ['days', 'balance', 'sharpe', 'sortino', 'return', 'fee', 'drawdown', 'num_trades', 'q_trades']
+QUOTER_DEFAULTS = {'future_q': 0, 'spot_q': 0, 'tau': 1}
+STRATEGY_DEFAULTS = {'spot_balance': 2, 'max_leverage': 1,
+                     'init_spot_position': 0, 'init_spot_avg_price': 0,
+                     'init_future_position': 0, 'init_future_avg_price': 0,
+                     'total_time_in_seconds': 1200, 'quote_frequency': 2000}
+EXCHANGE_DEFAULTS = {'market_data_latency_ms': 500, 'order_fill_latency_ms': 500}
+
+worker_data: data.Data = None
+worker_blocks: List[shared_memory.SharedMemory] = []
+
+
+class SharedData:
+    def __init__(self, dataObject: data.Data):
+        assert(dataObject.columnar)
+        rows, cols = dataObject.values.shape
+        self.timestamps_block = shared_memory.SharedMemory(create=True, size=max(rows * 8, 1))
+        self.values_block = shared_memory.SharedMemory(create=True, size=max(rows * cols * 8, 1))
+        np.ndarray(rows, dtype=np.int64, buffer=self.timestamps_block.buf)[:] = dataObject.timestamps
+        np.ndarray((rows, cols), dtype=np.float64, buffer=self.values_block.buf, order="F")[:] = dataObject.values
+        # everything a worker needs to rebuild a zero-copy Data on top of the two blocks
+        self.spec: Tuple = (self.timestamps_block.name, self.values_block.name, rows, list(dataObject.columns),
+                            dataObject.frequency)
+
+
+    def close(self) -> None:
+        for block in [self.timestamps_block, self.values_block]:
+            block.close()
+            block.unlink()
+
+
+def attach(spec: Tuple) -> Tuple[data.Data, List[shared_memory.SharedMemory]]:
+    timestamps_name, values_name, rows, columns, frequency = spec
+    blocks = [shared_memory.SharedMemory(name=timestamps_name), shared_memory.SharedMemory(name=values_name)]
+    timestamps = np.ndarray(rows, dtype=np.int64, buffer=blocks[0].buf)
+    values = np.ndarray((rows, len(columns)), dtype=np.float64, buffer=blocks[1].buf, order="F")
+    return data.Data.from_arrays(data.to_datetime(timestamps), values, columns, frequency), blocks
+
+
+def init_worker(spec: Tuple) -> None:
+    global worker_data, worker_blocks
+    worker_data, worker_blocks = attach(spec)
+
+
+def run_config(spot_instr: base_instrument.BaseInstrument, future_instr: base_instrument.BaseInstrument,
+               config: Dict, dataObject: data.Data=None) -> Tuple[Tuple, Tuple]:
+    dataObject = worker_data if dataObject is None else dataObject
+    quoter_args = dict(QUOTER_DEFAULTS, **config['quoter'])
+    strategy_args = dict(STRATEGY_DEFAULTS, **config.get('strategy', {}))
+    exchange_args = dict(EXCHANGE_DEFAULTS, **config.get('exchange', {}))
+
+    quoter = dual_as_quoter.DualASQuoter(spot_instr=spot_instr, future_instr=future_instr, **quoter_args)
+    strategy = multi_mm_strategy.MultiMMStrategy("sweep", quoter, spot_instr=spot_instr, future_instr=future_instr,
+                                                 length=dataObject.get_rows(), **strategy_args)
+    exch = exchange.Exchange(**exchange_args)
+    exch.register(strategy)
+    exch.start(dataObject)
+    while exch.step():
+        pass
+
+    return (strategy.spot_position.stat.summary(spot_instr.name),
+            strategy.future_position.stat.summary(future_instr.name))
+
+
+def iter_sweep(dataObject: data.Data, spot_instr: base_instrument.BaseInstrument,
+               future_instr: base_instrument.BaseInstrument, configs: List[Dict],
+               max_workers: int=None) -> Iterator[Tuple[int, Tuple, Tuple]]:
+    # market data is shared once; each worker attaches on start-up and results are yielded as runs finish
+    shared = SharedData(dataObject)
+    try:
+        with ProcessPoolExecutor(max_workers=max_workers or os.cpu_count(),
+                                 initializer=init_worker, initargs=(shared.spec,)) as pool:
+            futures = {pool.submit(run_config, spot_instr, future_instr, config): i
+                       for i, config in enumerate(configs)}
+            for future in as_completed(futures):
+                spot_summary, future_summary = future.result()
+                yield futures[future], spot_summary, future_summary
+    finally:
+        shared.close()
+
+
+def sweep(dataObject: data.Data, spot_instr: base_instrument.BaseInstrument,
+          future_instr: base_instrument.BaseInstrument, configs: List[Dict],
+          max_workers: int=None) -> pd.DataFrame:
+    rows = {}
+    for i, spot_summary, future_summary in iter_sweep(dataObject, spot_instr, future_instr, configs, max_workers):
+        row = dict(configs[i]['quoter'])
+        row.update(configs[i].get('strategy', {}))
+        row.update(configs[i].get('exchange', {}))
+        for instrument, summary in [(spot_instr, spot_summary), (future_instr, future_summary)]:
+            for col, value in zip(SUMMARY_COLUMNS, summary):
+                row[instrument.name + '_' + col] = value
+        rows[i] = row
+    return pd.DataFrame.from_dict(rows, orient='index').sort_index()
@@ -0,0 +1,128 @@
+import json
+import os
+import shutil
+import struct
+import sys
+import tempfile
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Tuple
+
+# Layout: MAGIC | uint64 header length | JSON header | padding to ALIGNMENT |
+#         int64 epoch-ns timestamps[rows] | float64 values[rows, columns] in column-major order
+MAGIC = b"MMTICK01"
+ALIGNMENT = 64
+PREFIX = len(MAGIC) + 8
+
+
+def describe_columns(columns: List[str]) -> Tuple[List[str], List[str]]:
+    instr_names = []
+    features = []
+    for col in columns:
+        if "feat_" in col:
+            features.append(col)
+        elif '_mid' in col:
+            instr_names.append(col.split('_')[0])
+    return instr_names, features
+
+
+def data_offset(header_length: int) -> int:
+    return (PREFIX + header_length + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def write_header(f, rows: int, columns: List[str]) -> None:
+    instr_names, features = describe_columns(columns)
+    header = json.dumps({
+        "rows": int(rows),
+        "columns": columns,
+        "instruments": instr_names,
+        "features": features,
+    }).encode("utf-8")
+    offset = data_offset(len(header))
+
+    f.write(MAGIC)
+    f.write(struct.pack("<Q", len(header)))
+    f.write(header)
+    f.write(b"\0" * (offset - PREFIX - len(header)))
+
+
+def write(path: str, df: pd.DataFrame) -> None:
+    with open(path, "wb") as f:
+        write_header(f, df.shape[0], [str(col) for col in df.columns])
+        np.asarray(df.index, dtype="datetime64[ns]").view(np.int64).astype("<i8").tofile(f)
+        for col in df.columns:
+            df[col].to_numpy(dtype="<f8").tofile(f)
+
+
+class Writer:
+    # streams row chunks into the column-major layout: each column is spooled to its own temporary file
+    # until the row count is known, then the pieces are copied behind the header
+    def __init__(self, path: str):
+        self.path: str = path
+        self.columns: List[str] = None
+        self.rows: int = 0
+        self.spool: str = tempfile.mkdtemp(dir=os.path.dirname(os.path.abspath(path)))
+        self.files = []
+
+
+    def append(self, df: pd.DataFrame) -> None:
+        if self.columns is None:
+            self.columns = [str(col) for col in df.columns]
+            self.files = [open(os.path.join(self.spool, str(i)), "wb") for i in range(len(self.columns) + 1)]
+        assert([str(col) for col in df.columns] == self.columns)
+        np.asarray(df.index, dtype="datetime64[ns]").view(np.int64).astype("<i8").tofile(self.files[0])
+        for f, col in zip(self.files[1:], df.columns):
+            df[col].to_numpy(dtype="<f8").tofile(f)
+        self.rows += df.shape[0]
+
+
+    def close(self) -> None:
+        try:
+            with open(self.path, "wb") as out:
+                write_header(out, self.rows, self.columns or [])
+                for f in self.files:
+                    f.close()
+                    with open(f.name, "rb") as spooled:
+                        shutil.copyfileobj(spooled, out)
+        except BaseException:
+            self.abort()
+            raise
+        shutil.rmtree(self.spool)
+
+
+    def abort(self) -> None:
+        # drops the spool and anything already written to path, so a failed run leaves no partial file
+        for f in self.files:
+            f.close()
+        shutil.rmtree(self.spool, ignore_errors=True)
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def read_header(path: str) -> Dict:
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise RuntimeError("Not a tick store file: " + path)
+        (length,) = struct.unpack("<Q", f.read(8))
+        header = json.loads(f.read(length).decode("utf-8"))
+    header["offset"] = data_offset(length)
+    return header
+
+
+def load(path: str) -> Tuple[Dict, np.ndarray, np.ndarray]:
+    header = read_header(path)
+    rows = header["rows"]
+    cols = len(header["columns"])
+    timestamps = np.memmap(path, dtype="<i8", mode="r", offset=header["offset"], shape=(rows,))
+    values = np.memmap(path, dtype="<f8", mode="r", offset=header["offset"] + rows * 8,
+                       shape=(rows, cols), order="F")
+    return header, timestamps, values
+
+
+def convert_csv(csv_path: str, path: str) -> None:
+    df = pd.read_csv(csv_path, header=0, index_col=0, parse_dates=[0])
+    write(path, df)
+
+
+if __name__ == "__main__":
+    convert_csv(sys.argv[1], sys.argv[2])
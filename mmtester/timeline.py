@@ -0,0 +1,181 @@
+import numpy as np
+import pandas as pd
+from typing import Iterator, List
+from mmtester import base_instrument, data, mm_enums, record, stat
+
+AXIS_FIELDS = {"timestamp": np.int64, "tick": np.int64, "row": np.int64}
+LEG_FIELDS = {"mid": np.float64, "balance": np.float64, "position": np.float64, "avg_price": np.float64,
+              "fee": np.float64, "trade_num": np.int64, "trade_qty": np.float64}
+
+
+class Timeline:
+    def __init__(self, length: int, instruments: List[base_instrument.BaseInstrument], rolling: bool=False):
+        self.instruments: List[base_instrument.BaseInstrument] = instruments
+        self.length = length
+        self.rolling: bool = rolling
+        assert(not (rolling and length is None))
+        self.stats: List[LegStat] = [LegStat(self, leg, instrument) for leg, instrument in enumerate(instruments)]
+        self.reset()
+
+
+    def reset(self) -> None:
+        capacity = stat.INITIAL_CAPACITY if self.length is None else self.length
+        for name, dtype in AXIS_FIELDS.items():
+            setattr(self, name, np.zeros(capacity, dtype=dtype))
+        # column-major so every leg's column is a contiguous array
+        for name, dtype in LEG_FIELDS.items():
+            setattr(self, name, np.zeros((capacity, len(self.instruments)), dtype=dtype, order="F"))
+        self.curr_record = 0
+        self.ticks = 0
+
+
+    def reserve(self, count: int) -> int:
+        capacity = len(self.timestamp)
+        if self.curr_record == capacity:
+            if self.rolling:
+                self.roll()
+            elif self.length is None:
+                self.grow(max(2 * capacity, self.curr_record + count))
+        return min(count, len(self.timestamp) - self.curr_record)
+
+
+    def grow(self, capacity: int) -> None:
+        for name, dtype in AXIS_FIELDS.items():
+            values = np.zeros(capacity, dtype=dtype)
+            values[:self.curr_record] = getattr(self, name)[:self.curr_record]
+            setattr(self, name, values)
+        for name, dtype in LEG_FIELDS.items():
+            values = np.zeros((capacity, len(self.instruments)), dtype=dtype, order="F")
+            values[:self.curr_record] = getattr(self, name)[:self.curr_record]
+            setattr(self, name, values)
+
+
+    def roll(self) -> None:
+        keep = self.length // 2
+        drop = self.curr_record - keep
+        for name in list(AXIS_FIELDS) + list(LEG_FIELDS):
+            values = getattr(self, name)
+            values[:keep] = values[drop:self.curr_record]
+        self.curr_record = keep
+
+
+    def advance(self, timestamp: int, row: int) -> None:
+        # opens the record every leg then fills through its LegStat
+        if self.reserve(1) <= 0:
+            raise IndexError("timeline capacity exceeded")
+        i = self.curr_record
+        self.timestamp[i] = timestamp
+        self.tick[i] = self.ticks
+        self.row[i] = row
+        self.curr_record += 1
+        self.ticks += 1
+
+
+    def blocks(self, block: record.RecordBlock) -> Iterator[record.RecordBlock]:
+        # opens records for the block in pieces that fit, yielding each piece for the legs to fill
+        start = 0
+        while start < len(block):
+            count = self.reserve(len(block) - start)
+            if count <= 0:
+                raise IndexError("timeline capacity exceeded")
+            begin = self.curr_record
+            end = begin + count
+            self.timestamp[begin:end] = block.timestamps[start:start + count]
+            self.tick[begin:end] = np.arange(self.ticks, self.ticks + count)
+            self.row[begin:end] = np.arange(block.counter + start, block.counter + start + count)
+            self.curr_record = end
+            self.ticks += count
+            yield block.slice(start, start + count)
+            start += count
+
+
+    def close(self) -> None:
+        for name in list(AXIS_FIELDS) + list(LEG_FIELDS):
+            setattr(self, name, getattr(self, name)[:self.curr_record])
+
+
+    def datetime(self) -> pd.DatetimeIndex:
+        return data.to_datetime(self.timestamp[:self.curr_record])
+
+
+    def equity(self, include_fee: bool=True) -> pd.Series:
+        # combined equity of all legs
+        total = np.zeros(self.curr_record)
+        for s in self.stats:
+            total += s.equity(None, include_fee=include_fee).to_numpy()
+        return pd.Series(total, index=self.datetime())
+
+
+def axis_column(name: str) -> property:
+    return property(lambda self: getattr(self.timeline, name))
+
+
+def leg_column(name: str) -> property:
+    return property(lambda self: getattr(self.timeline, name)[:, self.leg])
+
+
+class LegStat(stat.Stat):
+    # a Stat whose arrays are views onto one leg of a Timeline; the strategy advances the timeline once per
+    # tick and each leg only fills its own columns of the open records
+    timestamp = axis_column("timestamp")
+    tick = axis_column("tick")
+    row = axis_column("row")
+    mid = leg_column("mid")
+    balance = leg_column("balance")
+    position = leg_column("position")
+    avg_price = leg_column("avg_price")
+    fee = leg_column("fee")
+    trade_num = leg_column("trade_num")
+    trade_qty = leg_column("trade_qty")
+    curr_record = property(lambda self: self.timeline.curr_record)
+    ticks = property(lambda self: self.timeline.ticks)
+
+    def __init__(self, timeline: Timeline, leg: int, instrument: base_instrument.BaseInstrument, unit='ms'):
+        self.timeline: Timeline = timeline
+        self.leg: int = leg
+        self.instrument: base_instrument.BaseInstrument = instrument
+        self.unit: str = unit
+        self.policy: mm_enums.RecordPolicy = mm_enums.RecordPolicy.ALL
+        self.pending: tuple = None
+        self.cache = {}
+        self.cache_stamp = None
+
+
+    def reset(self) -> None:
+        self.timeline.reset()
+
+
+    def record(self, timestamp: int, mid: float, balance: float, position: float,
+               avg_price: float, fee: float, trade_num: int, trade_qty: float, row: int=-1) -> None:
+        i = self.timeline.curr_record - 1
+        leg = self.leg
+        self.timeline.mid[i, leg] = mid
+        self.timeline.balance[i, leg] = balance
+        self.timeline.position[i, leg] = position
+        self.timeline.avg_price[i, leg] = avg_price
+        self.timeline.fee[i, leg] = fee
+        self.timeline.trade_num[i, leg] = trade_num
+        self.timeline.trade_qty[i, leg] = trade_qty
+
+
+    def record_block(self, timestamps: np.ndarray, mids: np.ndarray, balance: float, position: float,
+                     avg_price: float, fee: float, trade_num: int, trade_qty: float, row: int=-1) -> None:
+        end = self.timeline.curr_record
+        rows = slice(end - len(timestamps), end)
+        leg = self.leg
+        self.timeline.mid[rows, leg] = mids
+        self.timeline.balance[rows, leg] = balance
+        self.timeline.position[rows, leg] = position
+        self.timeline.avg_price[rows, leg] = avg_price
+        self.timeline.fee[rows, leg] = fee
+        self.timeline.trade_num[rows, leg] = trade_num
+        self.timeline.trade_qty[rows, leg] = trade_qty
+
+
+    def close(self) -> None:
+        self.timeline.close()
+
+
+    def expand(self, dataObject: data.Data) -> None:
+        # a shared timeline stores every tick, so there is nothing to rebuild
+        self.close()
@@ -1,3 +1,5 @@
+import os
+import sys
 import numpy as np
 import pandas as pd
 from mmtester.dual_as_quoter import DualASQuoter
@@ -5,10 +7,126 @@ from mmtester.exchange import Exchange
 from mmtester.multi_mm_strategy import MultiMMStrategy
 from mmtester.inverse_instrument import InverseInstrument
 from mmtester.data import Data
+from mmtester.sweep import sweep
 import warnings
 warnings.filterwarnings('ignore')
 
+
+def load_chunks(chunksize):
+    store = "./mmtester/data_generator/data/data.bin"
+    if os.path.exists(store):
+        full = Data.from_tick_store(store, 100)
+        for start in range(0, full.get_rows(), chunksize):
+            yield full.slice(start, start + chunksize)
+    else:
+        for df in pd.read_csv("./mmtester/data_generator/data/data.csv.gz", header=0, index_col=0, parse_dates=[0], chunksize=chunksize):
+            yield Data(df, 100)
+
+
+def quoter_args(target_spot, target_future):
+    return dict(future_q=0, 
+                spot_q=0, 
+                gamma=0.5, 
+                kappa=2, 
+                tau=1, 
+                volatility=0.2,
+                spot_bid_price_skew=3,
+                spot_ask_price_skew=3,
+                spot_bid_size_skew=1,
+                spot_ask_size_skew=1,
+                future_bid_price_skew=3,
+                future_ask_price_skew=3,
+                future_bid_size_skew=1,
+                future_ask_size_skew=1,
+                spot_bid_levels=5,
+                spot_ask_levels=5,
+                future_bid_levels=5,
+                future_ask_levels=5,
+                spot_target_pct=target_spot,
+                future_target_pct=target_future,
+                tick_size=0.05,
+                lot_size=0.001,
+                max_quote_size=2)
+
+
+def make_quoter(spot_instr, future_instr, target_spot, target_future):
+    return DualASQuoter(spot_instr=spot_instr, future_instr=future_instr, **quoter_args(target_spot, target_future))
+
+
+def append_summary(res, stat, filename):
+    backtest_days, balance, sr, sortino, ret, fee, draw, ftn, ftq = stat.summary(filename)
+    res = res.append({'days':backtest_days, 'balance':balance, 
+                      'sharpe':sr, 'sortino':sortino, 'return': ret,
+                      'fee': fee, 'drawdown': draw, 
+                      'num_trades': ftn, 'q_trades': ftq}, ignore_index=True)
+    return res, ret
+
+
+def run_stream(chunksize):
+    # one continuous simulation: resting orders, pending cancels and latency state survive chunk boundaries
+    perp_res = pd.DataFrame(columns=['days', 'balance', 'sharpe', 'sortino', 'return', 'fee', 'drawdown', 'num_trades', 'q_trades'])
+    future_res = pd.DataFrame(columns=['days', 'balance', 'sharpe', 'sortino', 'return', 'fee', 'drawdown', 'num_trades', 'q_trades'])
+    exch = Exchange(500, 500)
+    spot_instr = InverseInstrument("perp", 0.000, 0.0005)
+    future_instr = InverseInstrument("future", -0.0001, 0.0005)
+    quoter = make_quoter(spot_instr, future_instr, 1, -1)
+    strategy = MultiMMStrategy("test_strategy", quoter, 2, 1, 0, 0, 0, 0,
+                               spot_instr, future_instr, 1200, 2000, chunksize, wrap_horizon=True)
+    exch.register(strategy)
+    exch.start(load_chunks(chunksize))
+
+    counter = 1
+    steps = 0
+    while exch.step():
+        steps += 1
+        if steps % chunksize == 0:
+            perp_res, pret = append_summary(perp_res, strategy.spot_position.stat, "perp" + str(counter))
+            future_res, fret = append_summary(future_res, strategy.future_position.stat, "future" + str(counter))
+            strategy.spot_position.stat.reset()
+            strategy.future_position.stat.reset()
+            quoter.spot_target_pct *= -1
+            quoter.future_target_pct *= -1
+            print("Counter=", counter, pret+fret, pret, fret)
+            counter += 1
+
+    # the stream can run out partway through a chunk, that last partial chunk still gets its summary
+    if steps % chunksize != 0:
+        perp_res, pret = append_summary(perp_res, strategy.spot_position.stat, "perp" + str(counter))
+        future_res, fret = append_summary(future_res, strategy.future_position.stat, "future" + str(counter))
+        print("Counter=", counter, pret+fret, pret, fret)
+
+    perp_res.to_csv("perp.csv", header=True)
+    future_res.to_csv("future.csv", header=True)
+
+
+def run_sweep():
+    # every (gamma, target) pair is an independent backtest fanned out over all cores
+    store = "./mmtester/data_generator/data/data.bin"
+    if os.path.exists(store):
+        dataObject = Data.from_tick_store(store, 100)
+    else:
+        dataObject = Data(pd.read_csv("./mmtester/data_generator/data/data.csv.gz", header=0, index_col=0, parse_dates=[0]), 100)
+
+    configs = []
+    for gamma in [0.1, 0.25, 0.5, 1.0]:
+        for target in [-1, 0, 1]:
+            configs.append({'quoter': dict(quoter_args(target, -target), gamma=gamma)})
+
+    spot_instr = InverseInstrument("perp", 0.000, 0.0005)
+    future_instr = InverseInstrument("future", -0.0001, 0.0005)
+    res = sweep(dataObject, spot_instr, future_instr, configs)
+    res.to_csv("sweep.csv", header=True)
+
+
 if __name__ == '__main__':
+    if "--stream" in sys.argv:
+        run_stream(9000)
+        sys.exit(0)
+
+    if "--sweep" in sys.argv:
+        run_sweep()
+        sys.exit(0)
+
     counter = 1
     perp_res = pd.DataFrame(columns=['days', 'balance', 'sharpe', 'sortino', 'return', 'fee', 'drawdown', 'num_trades', 'q_trades'])
     future_res = pd.DataFrame(columns=['days', 'balance', 'sharpe', 'sortino', 'return', 'fee', 'drawdown', 'num_trades', 'q_trades'])
@@ -20,35 +138,11 @@ if __name__ == '__main__':
     init_spot_avg_price = 0
     init_future_avg_price = 0
     
-    for df in pd.read_csv("./mmtester/data_generator/data/data.csv.gz", header=0, index_col=0, parse_dates=[0], chunksize=9000):
+    for dataObject in load_chunks(9000):
         exch = Exchange(500, 500)
         spot_instr = InverseInstrument("perp", 0.000, 0.0005)
         future_instr = InverseInstrument("future", -0.0001, 0.0005)
-        quoter = DualASQuoter(spot_instr=spot_instr,
-                          future_instr=future_instr,
-                          future_q=0, 
-                          spot_q=0, 
-                          gamma=0.5, 
-                          kappa=2, 
-                          tau=1, 
-                          volatility=0.2,
-                          spot_bid_price_skew=3,
-                          spot_ask_price_skew=3,
-                          spot_bid_size_skew=1,
-                          spot_ask_size_skew=1,
-                          future_bid_price_skew=3,
-                          future_ask_price_skew=3,
-                          future_bid_size_skew=1,
-                          future_ask_size_skew=1,
-                          spot_bid_levels=5,
-                          spot_ask_levels=5,
-                          future_bid_levels=5,
-                          future_ask_levels=5,
-                          spot_target_pct=target_spot,
-                          future_target_pct=target_future,
-                          tick_size=0.05,
-                          lot_size=0.001,
-                          max_quote_size=2)
+        quoter = make_quoter(spot_instr, future_instr, target_spot, target_future)
         
         target_spot *= -1
         target_future *= -1
@@ -56,9 +150,9 @@ if __name__ == '__main__':
         strategy = MultiMMStrategy("test_strategy", quoter, 2, 1, 
                                    init_spot_qty, init_spot_avg_price, 
                                    init_future_qty, init_future_avg_price,
-                                   spot_instr, future_instr, 1200, 2000, df.shape[0])
+                                   spot_instr, future_instr, 1200, 2000, dataObject.get_rows())
         exch.register(strategy)
-        exch.start(Data(df, 100))
+        exch.start(dataObject)
     
         iter = 0
         while exch.step():
@@ -69,16 +163,8 @@ if __name__ == '__main__':
         init_future_qty = strategy.future_position.total_qty
         init_future_avg_price = strategy.future_position.avg_price
         
-        backtest_days, balance, sr, sortino, pret, fee, draw, ftn, ftq = strategy.spot_position.stat.summary("perp" + str(counter))
-        perp_res = perp_res.append({'days':backtest_days, 'balance':balance, 
-                                    'sharpe':sr, 'sortino':sortino, 'return': pret,
-                                    'fee': fee, 'drawdown': draw, 
-                                    'num_trades': ftn, 'q_trades': ftq}, ignore_index=True)
-        backtest_days, balance, sr, sortino, fret, fee, draw, ftn, ftq = strategy.future_position.stat.summary("future" + str(counter))
-        future_res = future_res.append({'days':backtest_days, 'balance':balance, 
-                                        'sharpe':sr, 'sortino':sortino, 'return': fret,
-                                        'fee': fee, 'drawdown': draw, 
-                                        'num_trades': ftn, 'q_trades': ftq}, ignore_index=True)
+        perp_res, pret = append_summary(perp_res, strategy.spot_position.stat, "perp" + str(counter))
+        future_res, fret = append_summary(future_res, strategy.future_position.stat, "future" + str(counter))
         
         print("Counter=", counter, pret+fret, pret, fret)
         counter += 1
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pandas as pd
+from mmtester.dual_as_quoter import DualASQuoter
+from mmtester.exchange import Exchange
+from mmtester.inverse_instrument import InverseInstrument
+from mmtester.multi_mm_strategy import MultiMMStrategy
+
+
+def make_frame(rows, seed=0, jump_rate=0.0):
+    # perp and future quotes on a 0.05 tick every 100ms, moving enough for the ladders to trade; jumps of 5
+    # to 20 in the perp sweep through several stacked ladders in one tick
+    rng = np.random.default_rng(seed)
+    index = pd.date_range("2023-01-21", periods=rows, freq="100ms", name="date")
+    steps = rng.normal(0, 0.2, rows)
+    if jump_rate > 0:
+        jumps = rng.random(rows) < jump_rate
+        steps[jumps] = rng.choice([-1, 1], jumps.sum()) * rng.uniform(5, 20, jumps.sum())
+    perp = np.round((1600 + np.cumsum(steps)) * 20) / 20
+    future = np.round((perp + 2 + np.cumsum(rng.normal(0, 0.02, rows))) * 20) / 20
+    df = pd.DataFrame(index=index)
+    for name, mid in [("perp", perp), ("future", future)]:
+        df[name + "_bid"] = mid - 0.05
+        df[name + "_ask"] = mid + 0.05
+        df[name + "_mid"] = mid
+        df[name + "_featdummy"] = mid
+    return df
+
+
+BASE_CONFIG = dict(gamma=0.5, kappa=2, volatility=0.2,
+                   spot_bid_price_skew=3, spot_ask_price_skew=3, spot_bid_size_skew=1, spot_ask_size_skew=1,
+                   future_bid_price_skew=3, future_ask_price_skew=3, future_bid_size_skew=1, future_ask_size_skew=1,
+                   spot_bid_levels=5, spot_ask_levels=5, future_bid_levels=5, future_ask_levels=5,
+                   spot_target_pct=1, future_target_pct=-1, tick_size=0.05, lot_size=0.001, max_quote_size=2)
+
+
+def make_strategy(length, config=BASE_CONFIG, **strategy_args):
+    spot_instr = InverseInstrument("perp", 0.0, 0.0005)
+    future_instr = InverseInstrument("future", -0.0001, 0.0005)
+    quoter = DualASQuoter(spot_instr=spot_instr, future_instr=future_instr, future_q=0, spot_q=0, tau=1, **config)
+    return MultiMMStrategy("test_strategy", quoter, 2, 1, 0, 0, 0, 0, spot_instr, future_instr, 1200, 2000, length,
+                           **strategy_args)
+
+
+def run(source, length, config=BASE_CONFIG, fast_forward=False, frequency_milliseconds=None, recycle_orders=False,
+        **strategy_args):
+    strategy = make_strategy(length, config, **strategy_args)
+    exch = Exchange(500, 500, fast_forward=fast_forward, recycle_orders=recycle_orders)
+    exch.register(strategy)
+    exch.start(source, frequency_milliseconds)
+    while exch.step():
+        pass
+    return strategy
+
+
+def legs(strategy):
+    # final state of both legs, for exact comparisons between runs
+    return [(p.total_qty, p.avg_price, p.balance, p.fees, p.trade_num, p.trade_qty)
+            for p in [strategy.spot_position, strategy.future_position]]
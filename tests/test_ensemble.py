@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+from mmtester.data import Data
+from mmtester.ensemble import EnsembleBacktester
+from mmtester.inverse_instrument import InverseInstrument
+from mmtester import batch_metrics
+from tests.common import BASE_CONFIG, make_frame, run, legs
+import numpy as np
+import unittest
+
+CONFIGS = [BASE_CONFIG,
+           dict(BASE_CONFIG, gamma=0.2, kappa=3, volatility=0.3),
+           dict(BASE_CONFIG, spot_target_pct=-0.5, future_target_pct=0.5),
+           dict(BASE_CONFIG, spot_bid_levels=2, future_ask_levels=7, spot_bid_size_skew=1.5),
+           dict(BASE_CONFIG, spot_bid_price_skew=0, spot_ask_price_skew=0, future_bid_price_skew=1.5),
+           dict(BASE_CONFIG, tick_size=0.1, max_quote_size=1)]
+
+
+class EnsembleTestSuite(unittest.TestCase):
+    """EnsembleBacktester runs against one MultiMMStrategy run per config."""
+
+    rows = 6000
+
+    @classmethod
+    def make_data(cls):
+        return Data(make_frame(cls.rows), 100)
+
+    @classmethod
+    def setUpClass(cls):
+        cls.dataObject = cls.make_data()
+        spot_instr = InverseInstrument("perp", 0.0, 0.0005)
+        future_instr = InverseInstrument("future", -0.0001, 0.0005)
+        cls.ensemble = EnsembleBacktester(spot_instr, future_instr, CONFIGS, 2, 1, 1200)
+        cls.results = cls.ensemble.run(cls.dataObject)
+        cls.singles = [run(cls.dataObject, cls.rows, config) for config in CONFIGS]
+
+    def test_final_state(self):
+        for k, strategy in enumerate(self.singles):
+            with self.subTest(config=k):
+                self.assertTrue(all(leg[4] > 0 for leg in legs(strategy)))
+                expected = [(leg.total_qty[k], leg.avg_price[k], leg.balance[k], leg.fees[k], leg.trade_num[k],
+                             leg.trade_qty[k]) for leg in [self.ensemble.spot, self.ensemble.future]]
+                self.assertEqual(legs(strategy), expected)
+
+    def test_records(self):
+        for k, strategy in enumerate(self.singles):
+            for position, result in zip([strategy.spot_position, strategy.future_position], self.results):
+                with self.subTest(config=k, leg=position.instrument.name):
+                    stat = position.stat
+                    n = stat.curr_record
+                    self.assertEqual(n, len(result.mid))
+                    self.assertTrue(np.array_equal(stat.timestamp[:n], self.ensemble.record_timestamps))
+                    self.assertTrue(np.array_equal(stat.mid[:n], result.mid))
+                    for name, column in [("balance", result.balance), ("position", result.position),
+                                         ("fee", result.fee), ("trade_num", result.trade_num)]:
+                        self.assertTrue(np.array_equal(getattr(stat, name)[:n], column[:, k]), name)
+
+    def test_summaries(self):
+        for leg, result in enumerate(self.results):
+            batch = batch_metrics.from_ensemble(self.ensemble.record_timestamps, result, resample="1min").to_numpy()
+            for k, strategy in enumerate(self.singles):
+                position = [strategy.spot_position, strategy.future_position][leg]
+                with self.subTest(config=k, leg=position.instrument.name):
+                    expected = np.array(position.stat.summary(position.instrument.name, resample="1min"),
+                                        dtype=np.float64)
+                    np.testing.assert_allclose(batch[k], expected, rtol=1e-9, atol=1e-12, equal_nan=True)
+
+
+class StackedLaddersTestSuite(EnsembleTestSuite):
+    """The same comparison on a frame whose jumps cross orders of several stacked ladders in one tick,
+    where the fill order changes the realized PnL."""
+
+    rows = 8000
+
+    @classmethod
+    def make_data(cls):
+        return Data(make_frame(cls.rows, seed=8, jump_rate=0.002), 100)
+
+
+if __name__ == '__main__':
+    unittest.main()
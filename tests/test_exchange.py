@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+from mmtester.data import Data
+from mmtester.exchange import BaseStrategy, Exchange
+from mmtester.inverse_instrument import InverseInstrument
+from mmtester.order import Order, OrderBatch
+from mmtester import mm_enums
+import numpy as np
+import pandas as pd
+import unittest
+
+
+def step_frame(rows, jumps):
+    # constant perp and future quotes with 0.1 wide touches; jumps maps a row to the perp mid from then on
+    index = pd.date_range("2023-01-21", periods=rows, freq="100ms", name="date")
+    perp = np.full(rows, 1600.0)
+    for row, mid in sorted(jumps.items()):
+        perp[row:] = mid
+    df = pd.DataFrame(index=index)
+    for name, mid in [("perp", perp), ("future", np.full(rows, 1602.0))]:
+        df[name + "_bid"] = mid - 0.05
+        df[name + "_ask"] = mid + 0.05
+        df[name + "_mid"] = mid
+    return df
+
+
+class ScriptedStrategy(BaseStrategy):
+    # runs the action scheduled for a record counter and logs every fill and cancel
+    def __init__(self, name, instruments, actions):
+        super().__init__(name)
+        self.instruments = instruments
+        self.actions = actions
+        self.fills = []
+        self.cancels = []
+
+    def on_tick(self, record):
+        if record is not None and record.counter in self.actions:
+            self.actions[record.counter](self.exchange, record)
+
+    def on_cancel(self, order):
+        self.cancels.append((order.side, order.price, order.quantity))
+
+    def on_exchange_init(self, exch, data_frequency):
+        super().on_exchange_init(exch, data_frequency)
+
+    def on_fill(self, order, fill_type):
+        self.fills.append((order.side, order.price, order.quantity))
+
+
+class ExchangeTestSuite(unittest.TestCase):
+    """Exchange order handling with scripted strategies."""
+
+    def setUp(self):
+        self.perp = InverseInstrument("perp", 0.0, 0.0005)
+        self.future = InverseInstrument("future", -0.0001, 0.0005)
+
+    def run_script(self, df, actions, **exchange_args):
+        exch = Exchange(500, 500, **exchange_args)
+        strategy = ScriptedStrategy("scripted", [self.perp, self.future], actions)
+        exch.register(strategy)
+        exch.start(Data(df, 100))
+        while exch.step():
+            pass
+        return strategy
+
+    def bid(self, price, quantity):
+        return lambda exch, record: exch.add_order(Order(record.timestamp, "scripted", self.perp,
+                                                         mm_enums.Side.BUY, price, quantity))
+
+    def test_crossed_orders_fill_in_submission_order(self):
+        # the deeper bid was submitted first, so it fills first even though the later one is more aggressive
+        df = step_frame(100, {60: 1593.0})
+        strategy = self.run_script(df, {5: self.bid(1593.15, 1.0), 15: self.bid(1594.3, 2.0)})
+        self.assertEqual(strategy.fills, [(mm_enums.Side.BUY, 1593.15, 1.0), (mm_enums.Side.BUY, 1594.3, 2.0)])
+
+    def ladder(self, prices, quantities):
+        # three bid levels and one ask level, requoted through the incremental path
+        sides = [mm_enums.Side.BUY.value] * 3 + [mm_enums.Side.SELL.value]
+        return lambda exch, record: exch.requote_batch(record.timestamp, OrderBatch(record.timestamp, "scripted",
+                                                                                    self.perp, sides, prices,
+                                                                                    quantities))
+
+    def snapshot(self, snapshots):
+        # order id and current quantity of every level in the live ladder
+        def take(exch, record):
+            ladder = exch.ladders[("scripted", self.perp)]
+            snapshots.append({key: (batch.first_id + j, batch.quantities[j]) for key, (batch, j, _) in ladder.items()})
+        return take
+
+    def test_requote_keeps_amends_and_cancels_levels(self):
+        buy, sell = mm_enums.Side.BUY.value, mm_enums.Side.SELL.value
+        prices = [1599.9, 1599.5, 1599.0, 1600.5]
+        moved = [1599.9, 1599.5, 1598.8, 1600.5]
+        snapshots = []
+        # the perp ask drops to 1599.85 at row 50 and takes out the top bid only
+        df = step_frame(100, {50: 1599.8})
+        strategy = self.run_script(df, {
+            5: self.ladder(prices, [1.0, 1.0, 1.0, 1.0]),
+            15: self.snapshot(snapshots),
+            # level 1 changes size, level 2 moves price, the ask is dropped
+            20: self.ladder(moved, [1.0, 3.0, 1.0, 0.0]),
+            30: self.snapshot(snapshots),
+            # the amend back to 3 is requested while the amend to 2 is still in flight
+            35: self.ladder(moved, [1.0, 2.0, 1.0, 0.0]),
+            36: self.ladder(moved, [1.0, 3.0, 1.0, 0.0]),
+            45: self.snapshot(snapshots),
+            # after the fill only the filled level is quoted again, at the touch it was clamped to
+            65: self.ladder(moved, [1.0, 3.0, 1.0, 0.0]),
+            75: self.snapshot(snapshots)})
+
+        self.assertEqual(snapshots[0], {(buy, 0): (0, 1.0), (buy, 1): (1, 1.0), (buy, 2): (2, 1.0), (sell, 0): (3, 1.0)})
+        # unchanged and amended levels keep their ids, the moved level is a new order
+        self.assertEqual(snapshots[1], {(buy, 0): (0, 1.0), (buy, 1): (1, 3.0), (buy, 2): (4, 1.0)})
+        self.assertEqual(strategy.cancels, [(mm_enums.Side.BUY, 1599.0, 1.0), (mm_enums.Side.SELL, 1600.5, 1.0)])
+        self.assertEqual(snapshots[2], snapshots[1])
+        self.assertEqual(strategy.fills, [(mm_enums.Side.BUY, 1599.9, 1.0)])
+        self.assertEqual(snapshots[3], {(buy, 0): (5, 1.0), (buy, 1): (1, 3.0), (buy, 2): (4, 1.0)})
+        self.assertEqual(len(strategy.cancels), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
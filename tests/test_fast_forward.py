@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+from mmtester.data import Data
+from tests.common import make_frame, run, legs
+import numpy as np
+import unittest
+
+ROWS = 6000
+MODES = {"plain": {}, "incremental": {"incremental": True}, "shared timeline": {"shared_timeline": True},
+         "incremental shared timeline": {"incremental": True, "shared_timeline": True}}
+
+
+def summaries(strategy):
+    return [np.array(p.stat.summary(p.instrument.name, resample="1min"), dtype=np.float64)
+            for p in [strategy.spot_position, strategy.future_position]]
+
+
+class FastForwardTestSuite(unittest.TestCase):
+    """Event-skipping runs against stepping every row."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.dataObject = Data(make_frame(ROWS), 100)
+
+    def test_fast_forward_matches_stepping(self):
+        for name, strategy_args in MODES.items():
+            with self.subTest(mode=name):
+                stepped = run(self.dataObject, ROWS, **strategy_args)
+                skipped = run(self.dataObject, ROWS, fast_forward=True, **strategy_args)
+                self.assertTrue(all(leg[4] > 0 for leg in legs(stepped)))
+                self.assertEqual(legs(skipped), legs(stepped))
+                for expected, result in zip(summaries(stepped), summaries(skipped)):
+                    np.testing.assert_array_equal(result, expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
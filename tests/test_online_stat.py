@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+from mmtester.data import Data
+from tests.common import make_frame, run
+import numpy as np
+import unittest
+
+ROWS = 15000
+
+
+class OnlineStatTestSuite(unittest.TestCase):
+    """OnlineStat running metrics against Stat.summary over the stored history."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.dataObject = Data(make_frame(ROWS), 100)
+
+    def test_online_matches_history(self):
+        for fast_forward in [False, True]:
+            strategy = run(self.dataObject, ROWS, fast_forward=fast_forward, online=True)
+            for position in [strategy.spot_position, strategy.future_position]:
+                with self.subTest(fast_forward=fast_forward, leg=position.instrument.name):
+                    self.assertGreater(position.trade_num, 0)
+                    expected = np.array(position.stat.summary(position.instrument.name), dtype=np.float64)
+                    result = np.array(position.online.summary(), dtype=np.float64)
+                    np.testing.assert_allclose(result, expected, rtol=1e-9, equal_nan=True)
+
+
+if __name__ == '__main__':
+    unittest.main()
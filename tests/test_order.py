@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+from mmtester.data import Data
+from mmtester.inverse_instrument import InverseInstrument
+from mmtester.order import OrderBatch, OrderPool
+from mmtester import mm_enums
+from tests.common import make_frame, run, legs
+import numpy as np
+import unittest
+
+ROWS = 6000
+
+
+class OrderPoolTestSuite(unittest.TestCase):
+    """Recycled Order objects against fresh ones."""
+
+    def test_acquired_order_is_reset(self):
+        perp = InverseInstrument("perp", 0.0, 0.0005)
+        future = InverseInstrument("future", -0.0001, 0.0005)
+        pool = OrderPool()
+        batch = OrderBatch(1, "old", perp, [mm_enums.Side.BUY.value], [1599.5], [1.0])
+        batch.pool = pool
+        filled = batch.get_order(0)
+        batch.set_state(0, mm_enums.OrderState.FILLED)
+        batch.recycle(0)
+        self.assertEqual(len(pool), 1)
+        self.assertIsNone(filled.batch)
+
+        fresh = OrderBatch(2, "new", future, [mm_enums.Side.SELL.value, mm_enums.Side.SELL.value],
+                           [1603.0, 1603.5], [2.0, 3.0])
+        fresh.pool = pool
+        o = fresh.get_order(1)
+        self.assertIs(o, filled)
+        self.assertEqual(len(pool), 0)
+        self.assertEqual((o.timestamp, o.strategy_name, o.instrument, o.side, o.price, o.quantity, o.state),
+                         (2, "new", future, mm_enums.Side.SELL, 1603.5, 3.0, mm_enums.OrderState.NEW))
+        self.assertIs(o.batch, fresh)
+        self.assertEqual(o.index, 1)
+
+    def test_recycled_run_matches_fresh_orders(self):
+        dataObject = Data(make_frame(ROWS), 100)
+        for fast_forward in [False, True]:
+            with self.subTest(fast_forward=fast_forward):
+                fresh = run(dataObject, ROWS, fast_forward=fast_forward)
+                recycled = run(dataObject, ROWS, fast_forward=fast_forward, recycle_orders=True)
+                self.assertTrue(all(leg[4] > 0 for leg in legs(fresh)))
+                self.assertEqual(legs(recycled), legs(fresh))
+                for position, expected in zip([recycled.spot_position, recycled.future_position],
+                                              [fresh.spot_position, fresh.future_position]):
+                    for name in ["timestamp", "mid", "balance", "position", "trade_num"]:
+                        np.testing.assert_array_equal(getattr(position.stat, name), getattr(expected.stat, name))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+from mmtester.data import Data, DataStream
+from mmtester.mm_enums import RecordPolicy
+from tests.common import make_frame, run, legs
+import numpy as np
+import unittest
+
+ROWS = 6000
+POLICIES = {"change": (RecordPolicy.CHANGE, 1), "interval": (RecordPolicy.INTERVAL, 50),
+            "bucket": (RecordPolicy.BUCKET, 1)}
+
+
+def summaries(strategy, dataObject=None):
+    return [np.array(p.stat.summary(p.instrument.name, resample="1min", dataObject=dataObject), dtype=np.float64)
+            for p in [strategy.spot_position, strategy.future_position]]
+
+
+class RecordPolicyTestSuite(unittest.TestCase):
+    """Sparse record policies expanded against storing every tick."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.df = make_frame(ROWS)
+        cls.dataObject = Data(cls.df, 100)
+        cls.reference = run(cls.dataObject, ROWS)
+        cls.expected = summaries(cls.reference)
+
+    def test_expanded_summaries_match_all(self):
+        for name, (policy, interval) in POLICIES.items():
+            for fast_forward in [False, True]:
+                with self.subTest(policy=name, fast_forward=fast_forward):
+                    strategy = run(self.dataObject, ROWS, fast_forward=fast_forward,
+                                   record_policy=policy, record_interval=interval)
+                    self.assertEqual(legs(strategy), legs(self.reference))
+                    self.assertLess(strategy.spot_position.stat.curr_record, ROWS // 2)
+                    for expected, result in zip(self.expected, summaries(strategy, self.dataObject)):
+                        np.testing.assert_array_equal(result, expected)
+
+    def test_summary_without_expand_raises(self):
+        for name, (policy, interval) in POLICIES.items():
+            with self.subTest(policy=name):
+                strategy = run(self.dataObject, ROWS, record_policy=policy, record_interval=interval)
+                with self.assertRaises(RuntimeError):
+                    summaries(strategy)
+
+    def test_stream_window_past_first_record_raises(self):
+        stream = DataStream((self.df.iloc[s:s + 1000] for s in range(0, ROWS, 1000)), 100)
+        strategy = run(stream, ROWS, record_policy=RecordPolicy.CHANGE)
+        self.assertGreater(stream.offset, 0)
+        with self.assertRaises(RuntimeError):
+            summaries(strategy, stream)
+
+
+if __name__ == '__main__':
+    unittest.main()
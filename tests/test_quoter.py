@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+from mmtester.dual_as_quoter import DualASQuoter
+from mmtester.inverse_instrument import InverseInstrument
+from mmtester.multi_mm_strategy import MultiMMStrategy
+from mmtester import mm_enums
+import numpy as np
+import unittest
+
+
+class QuoterTestSuite(unittest.TestCase):
+    """DualASQuoter ladder tests."""
+
+    def make_quoter(self, price_skew):
+        self.spot_instr = InverseInstrument("perp", 0.0, 0.0005)
+        self.future_instr = InverseInstrument("future", -0.0001, 0.0005)
+        return DualASQuoter(spot_instr=self.spot_instr, future_instr=self.future_instr,
+                            future_q=0, spot_q=0, gamma=0.5, kappa=2, tau=1, volatility=0.2,
+                            spot_bid_price_skew=price_skew, spot_ask_price_skew=price_skew,
+                            spot_bid_size_skew=1, spot_ask_size_skew=1,
+                            future_bid_price_skew=price_skew, future_ask_price_skew=price_skew,
+                            future_bid_size_skew=1, future_ask_size_skew=1,
+                            spot_bid_levels=3, spot_ask_levels=3, future_bid_levels=3, future_ask_levels=3,
+                            spot_target_pct=-1, future_target_pct=-1, tick_size=0.05, lot_size=0.001,
+                            max_quote_size=2)
+
+    def test_bids_below_and_asks_above_mid(self):
+        for price_skew in [0, 1, 3]:
+            quoter = self.make_quoter(price_skew)
+            strategy = MultiMMStrategy("test_strategy", quoter, 2, 1, 0, 0, 0, 0,
+                                       self.spot_instr, self.future_instr, 1200, 2000, 10)
+            for batch in quoter.quote(0, strategy, 1600.0, 1600.0):
+                buy = batch.sides == mm_enums.Side.BUY.value
+                self.assertEqual(np.count_nonzero(buy), 3)
+                self.assertTrue((batch.prices[buy] <= 1600.0).all())
+                self.assertTrue((batch.prices[~buy] >= 1600.0).all())
+
+
+if __name__ == '__main__':
+    unittest.main()
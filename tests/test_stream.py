@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+from mmtester.data import Data, DataStream
+from tests.common import make_frame, run, legs
+import numpy as np
+import unittest
+
+ROWS = 6000
+
+
+class StreamTestSuite(unittest.TestCase):
+    """Chunked DataStream runs against a single Data run."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.df = make_frame(ROWS)
+        cls.reference = run(Data(cls.df, 100), ROWS)
+
+    def sources(self):
+        df = self.df
+        return {"data chunks": ((Data(df.iloc[s:s + 1000], 100) for s in range(0, ROWS, 1000)), None),
+                "frame chunks": ((df.iloc[s:s + 777] for s in range(0, ROWS, 777)), 100),
+                "inferred frequency": ((df.iloc[s:s + 5000] for s in range(0, ROWS, 5000)), None),
+                "stream": (DataStream((df.iloc[s:s + 1234] for s in range(0, ROWS, 1234)), 100), None)}
+
+    def assertSameRun(self, strategy, reference):
+        self.assertEqual(legs(strategy), legs(reference))
+        for position, expected in zip([strategy.spot_position, strategy.future_position],
+                                      [reference.spot_position, reference.future_position]):
+            stat, ref = position.stat, expected.stat
+            self.assertEqual(stat.curr_record, ref.curr_record)
+            for name in ["timestamp", "mid", "balance", "position", "trade_num"]:
+                self.assertTrue(np.array_equal(getattr(stat, name)[:stat.curr_record],
+                                               getattr(ref, name)[:ref.curr_record]), name)
+
+    def test_reference_trades(self):
+        self.assertTrue(all(leg[4] > 0 for leg in legs(self.reference)))
+
+    def test_chunks_match_single_data(self):
+        for name, (source, frequency) in self.sources().items():
+            with self.subTest(source=name):
+                self.assertSameRun(run(source, ROWS, frequency_milliseconds=frequency), self.reference)
+
+    def test_fast_forward_chunks_match_single_data(self):
+        for name, (source, frequency) in self.sources().items():
+            with self.subTest(source=name):
+                self.assertSameRun(run(source, ROWS, fast_forward=True, frequency_milliseconds=frequency),
+                                   self.reference)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+from multiprocessing import shared_memory
+from unittest import mock
+from mmtester.data import Data
+from mmtester.inverse_instrument import InverseInstrument
+from mmtester import sweep
+from tests.common import make_frame, BASE_CONFIG
+import numpy as np
+import unittest
+
+# enough rows for several 5min buckets in Stat.summary
+ROWS = 12000
+
+
+class SweepTestSuite(unittest.TestCase):
+    """Parallel sweeps over shared memory against sequential single runs."""
+
+    def setUp(self):
+        self.dataObject = Data(make_frame(ROWS), 100)
+        self.spot = InverseInstrument("perp", 0.0, 0.0005)
+        self.future = InverseInstrument("future", -0.0001, 0.0005)
+        self.configs = [{'quoter': dict(BASE_CONFIG, gamma=gamma)} for gamma in [0.25, 0.5, 1.0]]
+
+    def test_sweep_matches_sequential_runs(self):
+        created = []
+
+        class RecordingSharedData(sweep.SharedData):
+            def __init__(self, dataObject):
+                super().__init__(dataObject)
+                created.append(self)
+
+        with mock.patch.object(sweep, "SharedData", RecordingSharedData):
+            result = sweep.sweep(self.dataObject, self.spot, self.future, self.configs, max_workers=2)
+
+        self.assertEqual(list(result.index), [0, 1, 2])
+        for i, config in enumerate(self.configs):
+            spot_summary, future_summary = sweep.run_config(self.spot, self.future, config, self.dataObject)
+            self.assertGreater(future_summary[7], 0)
+            for instrument, summary in [(self.spot, spot_summary), (self.future, future_summary)]:
+                columns = [instrument.name + '_' + col for col in sweep.SUMMARY_COLUMNS]
+                np.testing.assert_array_equal(result.loc[i, columns].to_numpy(dtype=np.float64),
+                                              np.array(summary, dtype=np.float64))
+
+        # both blocks are unlinked once the sweep returns
+        self.assertEqual(len(created), 1)
+        for name in created[0].spec[:2]:
+            with self.assertRaises(FileNotFoundError):
+                shared_memory.SharedMemory(name=name)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+from mmtester.data import Data
+from tests.common import make_frame
+import numpy as np
+import os
+import tempfile
+import unittest
+
+
+class TickStoreTestSuite(unittest.TestCase):
+    """Tick store round trip tests."""
+
+    def setUp(self):
+        self.df = make_frame(1000)
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "ticks.bin")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def assertSameData(self, loaded, expected):
+        self.assertEqual(loaded.columns, expected.columns)
+        self.assertEqual(loaded.get_instrument_names(), expected.get_instrument_names())
+        self.assertEqual(loaded.get_feature_names(), expected.get_feature_names())
+        self.assertTrue(np.array_equal(loaded.timestamps, expected.timestamps))
+        self.assertTrue(np.array_equal(np.asarray(loaded.values), expected.values))
+
+    def test_round_trip(self):
+        dataObject = Data(self.df, 100)
+        dataObject.to_tick_store(self.path)
+        self.assertSameData(Data.from_tick_store(self.path, 100), dataObject)
+
+
+if __name__ == '__main__':
+    unittest.main()